@@ -0,0 +1,450 @@
+"""
+Headless HTTP API for machine clients, served alongside the Streamlit app.
+
+Endpoints (JSON in, JSON out):
+    POST /api/complaints              submit one complaint
+    POST /api/complaints/batch        submit {"complaints": [...]}, up to MAX_BATCH
+    GET  /api/complaints/<ticket_id>  track a complaint (no personal details)
+    GET  /api/search?q=...&limit=20   search complaints (no personal details)
+    GET  /api/stats                   dashboard statistics
+    GET  /metrics                     Prometheus metrics of this process
+
+A complaint is {"name", "email", "complaint_text", "phone" (optional),
+"anonymous" (optional)}.
+
+The server runs on Tornado (installed with Streamlit) over asyncio. The
+analyzers, the classifier and SQLite are blocking, so they run on a thread
+pool; concurrent single submissions share micro-batches through
+inference.BatchPredictor.
+
+Usage:
+    python api.py --port 8000
+    python api.py --port 8000 --metrics-file /var/lib/node_exporter/grievance_api.prom
+    python api.py --load-test --requests 2000 --concurrency 32
+    python api.py --load-test --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tornado.ioloop
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+import metrics
+from compact_model import load_classifier
+from database import GrievanceDatabase
+from dedupe import open_index
+from inference import BatchPredictor
+from utils import claim_ticket_worker, complaint_record, enrich, generate_ticket_id
+
+
+MAX_BATCH = 1000
+MAX_COMPLAINT_LENGTH = 10000
+MAX_SEARCH_LIMIT = 200
+# Tracking and search are unauthenticated, so they return no personal details
+TRACK_FIELDS = ("ticket_id", "category", "priority", "status", "department",
+                "resolution_time", "submitted_at")
+SEARCH_FIELDS = ("ticket_id", "category", "priority", "status", "department",
+                 "submitted_at", "snippet")
+REQUIRED_FIELDS = ("name", "email", "complaint_text")
+
+# Attempts at inserting a complaint whose ticket ID is already taken
+INSERT_ATTEMPTS = 3
+
+
+class GrievanceAPI:
+    """State shared by the request handlers.
+
+    db          : GrievanceDatabase
+    classifier  : trained model (None files everything under the default
+                  category, like the app without a model)
+    max_workers : threads for analysis and database calls
+    """
+
+    def __init__(self, db=None, classifier=None, max_workers=8):
+        self.db = db or GrievanceDatabase()
+        claim_ticket_worker(self.db)
+        self.predictor = BatchPredictor(classifier) if classifier is not None else None
+        self.duplicates = open_index(self.db)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api")
+
+    async def run(self, func, *args):
+        """Run blocking work on the executor without stalling the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def file_complaints(self, complaints):
+        """Analyse and store validated complaints; blocking.
+
+        Returns one result per complaint: the analysis summary, with
+        "duplicate_of" set to the earlier ticket it repeats (or None), or
+        {"error": ...} if it could not be stored.
+        """
+        texts = [c["complaint_text"] for c in complaints]
+        analyses = enrich(texts, classifier=self.predictor)
+        records = [
+            complaint_record(
+                analysis,
+                "Anonymous" if c.get("anonymous") else c["name"],
+                c["email"], c["complaint_text"], phone=c.get("phone")
+            )
+            for c, analysis in zip(complaints, analyses)
+        ]
+
+        # Retry the rare ticket ID clash with fresh IDs
+        pending = list(range(len(records)))
+        for _ in range(INSERT_ATTEMPTS):
+            result = self.db.add_complaints_bulk([records[i] for i in pending])
+            taken = set(result["duplicates"])
+            pending = [i for i in pending if records[i]["ticket_id"] in taken]
+            if not pending:
+                break
+            for i in pending:
+                records[i]["ticket_id"] = generate_ticket_id()
+
+        failed = set(pending)
+
+        # Index the new complaints and link the ones repeating earlier ones
+        self.duplicates.sync(self.db)
+        links = self.db.get_duplicate_links(
+            r["ticket_id"] for i, r in enumerate(records) if i not in failed
+        )
+
+        return [
+            {"error": "could not be registered, please retry"} if i in failed else {
+                "ticket_id": record["ticket_id"],
+                "category": record["category"],
+                "priority": record["priority"],
+                "priority_terms": analysis["priority_terms"],
+                "department": record["department"],
+                "sentiment": analysis["sentiment"],
+                "keywords": analysis["keywords"],
+                "resolution_time": record["resolution_time"],
+                "status": record["status"],
+                "submitted_at": record["submitted_at"],
+                "duplicate_of": links.get(record["ticket_id"], {}).get("duplicate_of"),
+            }
+            for i, (record, analysis) in enumerate(zip(records, analyses))
+        ]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.predictor is not None:
+            self.predictor.close()
+
+
+def validate_complaint(payload):
+    """Return an error message for an invalid complaint, else None."""
+    if not isinstance(payload, dict):
+        return "complaint must be a JSON object"
+    for field in REQUIRED_FIELDS:
+        value = payload.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"'{field}' is required"
+    if len(payload["complaint_text"]) > MAX_COMPLAINT_LENGTH:
+        return f"'complaint_text' is longer than {MAX_COMPLAINT_LENGTH} characters"
+    if payload.get("phone") is not None and not isinstance(payload["phone"], str):
+        return "'phone' must be a string"
+    return None
+
+
+# ================= HANDLERS =================
+class BaseHandler(tornado.web.RequestHandler):
+    # Requests are timed as metrics operation "api.<operation>"
+    operation = None
+
+    def initialize(self, api):
+        self.api = api
+
+    def on_finish(self):
+        if self.operation:
+            status = self.get_status()
+            metrics.observe(f"api.{self.operation}", self.request.request_time(), status >= 500)
+            metrics.increment(f"api.responses_{status // 100}xx")
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(payload, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        error = kwargs.get("exc_info", (None, None))[1]
+        message = getattr(error, "log_message", None) or self._reason
+        self.write_json({"error": message}, status_code)
+
+    def json_body(self):
+        try:
+            return json.loads(self.request.body)
+        except ValueError:
+            raise tornado.web.HTTPError(400, "request body is not valid JSON")
+
+
+class SubmitHandler(BaseHandler):
+    operation = "submit"
+
+    async def post(self):
+        payload = self.json_body()
+        error = validate_complaint(payload)
+        if error:
+            raise tornado.web.HTTPError(400, error)
+
+        result = (await self.api.run(self.api.file_complaints, [payload]))[0]
+        if "error" in result:
+            raise tornado.web.HTTPError(503, result["error"])
+        self.write_json(result, 201)
+
+
+class BatchSubmitHandler(BaseHandler):
+    operation = "submit_batch"
+
+    async def post(self):
+        payload = self.json_body()
+        complaints = payload.get("complaints") if isinstance(payload, dict) else None
+        if not isinstance(complaints, list) or not complaints:
+            raise tornado.web.HTTPError(400, "'complaints' must be a non-empty list")
+        if len(complaints) > MAX_BATCH:
+            raise tornado.web.HTTPError(400, f"at most {MAX_BATCH} complaints per batch")
+        for i, complaint in enumerate(complaints):
+            error = validate_complaint(complaint)
+            if error:
+                raise tornado.web.HTTPError(400, f"complaints[{i}]: {error}")
+
+        results = await self.api.run(self.api.file_complaints, complaints)
+        self.write_json({"results": results}, 201)
+
+
+class TrackHandler(BaseHandler):
+    operation = "track"
+
+    async def get(self, ticket_id):
+        complaint = await self.api.run(self.api.db.get_complaint_by_ticket, ticket_id)
+        if complaint is None:
+            raise tornado.web.HTTPError(404, f"ticket {ticket_id} not found")
+        links = await self.api.run(self.api.db.get_duplicate_links, [ticket_id])
+        result = {field: complaint.get(field) for field in TRACK_FIELDS}
+        result["duplicate_of"] = links.get(ticket_id, {}).get("duplicate_of")
+        self.write_json(result)
+
+
+class SearchHandler(BaseHandler):
+    operation = "search"
+
+    async def get(self):
+        query = self.get_query_argument("q", "").strip()
+        if not query:
+            raise tornado.web.HTTPError(400, "'q' is required")
+        try:
+            limit = int(self.get_query_argument("limit", "20"))
+        except ValueError:
+            raise tornado.web.HTTPError(400, "'limit' must be an integer")
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise tornado.web.HTTPError(400, f"'limit' must be between 1 and {MAX_SEARCH_LIMIT}")
+
+        rows = await self.api.run(self.api.db.search_complaints, query, limit)
+        self.write_json({"results": [{field: row.get(field) for field in SEARCH_FIELDS}
+                                     for row in rows]})
+
+
+class StatsHandler(BaseHandler):
+    operation = "stats"
+
+    async def get(self):
+        self.write_json(await self.api.run(self.api.db.get_statistics))
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(metrics.prometheus_text())
+
+
+def make_app(api):
+    routes = [
+        (r"/api/complaints", SubmitHandler),
+        (r"/api/complaints/batch", BatchSubmitHandler),
+        (r"/api/complaints/([^/]+)", TrackHandler),
+        (r"/api/search", SearchHandler),
+        (r"/api/stats", StatsHandler),
+        (r"/metrics", MetricsHandler),
+    ]
+    return tornado.web.Application([(path, handler, {"api": api}) for path, handler in routes])
+
+
+async def serve(port, db_path, metrics_file=None, metrics_interval=15):
+    api = GrievanceAPI(GrievanceDatabase(db_path), load_classifier())
+    server = make_app(api).listen(port)
+    print(f"🚀 Grievance API listening on http://127.0.0.1:{port}/api")
+
+    # Optionally dump the metrics to a file for collectors that don't scrape
+    dump = None
+    if metrics_file:
+        dump = tornado.ioloop.PeriodicCallback(
+            lambda: metrics.write_prometheus(metrics_file), metrics_interval * 1000
+        )
+        dump.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if dump:
+            dump.stop()
+            metrics.write_prometheus(metrics_file)
+        server.stop()
+        api.close()
+
+
+# ================= LOAD TEST =================
+# Share of each request type in the load test
+LOAD_MIX = {"submit": 0.2, "track": 0.4, "search": 0.2, "stats": 0.2}
+SEARCH_TERMS = ("water", "garbage", "road", "electricity", "hospital", "drainage")
+
+
+def _complaint_texts(path="data/cleaned_data.csv"):
+    import pandas as pd
+    return pd.read_csv(path)["complaint_text"].astype(str).tolist()
+
+
+async def load_test(url, requests=2000, concurrency=32, seed=42):
+    """Fire a mixed workload at a running API and report latency and RPS.
+
+    Returns {kind: {"count", "errors", "p50_ms", "p99_ms"}} plus "total".
+    """
+    rng = random.Random(seed)
+    texts = _complaint_texts()
+    client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+    latencies = {kind: [] for kind in LOAD_MIX}
+    errors = {kind: 0 for kind in LOAD_MIX}
+    tickets = []
+
+    def submission():
+        return {"name": "Load Test", "email": "load@example.com",
+                "complaint_text": rng.choice(texts)}
+
+    async def call(kind):
+        if kind == "track" and not tickets:
+            kind = "submit"
+        options = {}
+        if kind == "submit":
+            target = f"{url}/api/complaints"
+            options = {"method": "POST", "body": json.dumps(submission())}
+        elif kind == "track":
+            target = f"{url}/api/complaints/{rng.choice(tickets)}"
+        elif kind == "search":
+            target = f"{url}/api/search?q={rng.choice(SEARCH_TERMS)}&limit=20"
+        else:
+            target = f"{url}/api/stats"
+
+        start = time.perf_counter()
+        try:
+            response = await client.fetch(target, **options)
+        except (HTTPClientError, OSError):
+            errors[kind] += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+        if kind == "submit":
+            tickets.append(json.loads(response.body)["ticket_id"])
+
+    kinds = rng.choices(list(LOAD_MIX), weights=list(LOAD_MIX.values()), k=requests)
+    queue = iter(kinds)
+
+    async def worker():
+        for kind in queue:
+            await call(kind)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    def summary(samples, failed):
+        ms = np.asarray(samples) * 1000
+        return {
+            "count": len(samples),
+            "errors": failed,
+            "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+            "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+        }
+
+    report = {kind: summary(latencies[kind], errors[kind]) for kind in LOAD_MIX}
+    report["total"] = summary(sum(latencies.values(), []), sum(errors.values()))
+    report["total"]["rps"] = requests / elapsed
+    return report
+
+
+def print_load_report(report):
+    print(f"   {'endpoint':<10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for kind, row in report.items():
+        p50 = f"{row['p50_ms']:.1f}" if row["p50_ms"] is not None else "-"
+        p99 = f"{row['p99_ms']:.1f}" if row["p99_ms"] is not None else "-"
+        print(f"   {kind:<10} {row['count']:>7} {row['errors']:>7} {p50:>9} {p99:>9}")
+    print(f"   throughput: {report['total']['rps']:.0f} requests/s")
+
+
+async def _wait_until_up(url, timeout=60):
+    client = AsyncHTTPClient(force_instance=True)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                await client.fetch(f"{url}/api/stats")
+                return
+            except (HTTPClientError, OSError):
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+    finally:
+        client.close()
+
+
+def run_load_test(url=None, requests=2000, concurrency=32, port=8765):
+    """Load-test `url`, or a throwaway server on a scratch database."""
+    if url:
+        return asyncio.run(load_test(url, requests, concurrency))
+
+    directory = tempfile.mkdtemp()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--port", str(port),
+                               "--db", os.path.join(directory, "loadtest.db")],
+                              stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(_wait_until_up(url))
+        return asyncio.run(load_test(url, requests, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grievance HTTP API")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default="data/grievances.db", help="SQLite database path")
+    parser.add_argument("--load-test", action="store_true",
+                        help="load-test --url, or a scratch server if no --url is given")
+    parser.add_argument("--url", help="API base URL for --load-test, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--metrics-file", help="also write Prometheus metrics to this file")
+    parser.add_argument("--metrics-interval", type=float, default=15,
+                        help="seconds between --metrics-file writes")
+    args = parser.parse_args()
+
+    if args.load_test:
+        print_load_report(run_load_test(args.url, args.requests, args.concurrency))
+    else:
+        try:
+            asyncio.run(serve(args.port, args.db, args.metrics_file, args.metrics_interval))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
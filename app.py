@@ -1,19 +1,19 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import joblib
+import io
 import os
+import time
+from contextlib import contextmanager
+from importlib.util import find_spec
 
-from utils import (
-    get_priority,
-    get_department,
-    get_sentiment,
-    extract_keywords,
-    estimate_resolution_time,
-    generate_ticket_id,
-)
+import metrics
+from utils import enrich, complaint_record, generate_ticket_id, claim_ticket_worker
 from database import GrievanceDatabase
-from report_generator import generate_pdf_report
+from inference import BatchPredictor
+from compact_model import load_classifier
+from report_generator import ReceiptRenderer, receipt_fields
+from dedupe import open_index
 
 # ================= PAGE CONFIG =================
 st.set_page_config(
@@ -23,6 +23,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+run_started = time.perf_counter()
+
 # ================= CSS =================
 st.markdown("""
 <style>
@@ -133,21 +135,89 @@ st.markdown("""
 
 # ================= DATABASE & MODEL =================
 db = GrievanceDatabase()
+ADMIN_PAGE_SIZE = 50
+
+@st.cache_resource
+def load_ticket_worker():
+    # Ticket ID worker number leased from the database, once per server process
+    return claim_ticket_worker(db)
+
+load_ticket_worker()
 
 @st.cache_resource
 def load_model():
-    path = "model/classifier.pkl"
-    return joblib.load(path) if os.path.exists(path) else None
+    return load_classifier()
+
+# One predictor per server process: concurrent sessions share its micro-batches
+@st.cache_resource
+def load_predictor():
+    model = load_model()
+    return BatchPredictor(model) if model is not None else None
+
+predictor = load_predictor()
+
+@st.cache_resource
+def load_receipt_renderer():
+    # PDF receipts render on a background pool, cached by content
+    return ReceiptRenderer()
 
-model = load_model()
+renderer = load_receipt_renderer()
 
-def predict_category(text):
-    if model:
-        try:
-            return model.predict([text])[0]
-        except:
-            return "Administrative"
-    return "Administrative"
+@st.cache_resource
+def load_duplicate_index():
+    # Near-duplicate index, loaded from next to the database and shared
+    return open_index(db)
+
+duplicate_index = load_duplicate_index()
+
+def read_receipt(receipt, timeout=30):
+    """Wait for a queued receipt and return its PDF bytes."""
+    with open(receipt.result(timeout), "rb") as pdf:
+        return pdf.read()
+
+@st.fragment(run_every=1)
+def receipt_download(receipt, label, file_name, **button_args):
+    """Download button for a queued receipt, shown once it has rendered;
+    until then the fragment re-checks every second without blocking."""
+    if not receipt.done():
+        st.caption("⏳ Preparing your PDF receipt...")
+    elif receipt.exception() is not None:
+        st.error("❌ The receipt could not be generated. Please use Track Complaint to try again.")
+    else:
+        st.download_button(label, data=read_receipt(receipt), file_name=file_name,
+                           mime="application/pdf", **button_args)
+
+# ================= CACHED DATA LOADS =================
+# Keyed on the database write sequence, so any write (from this app, the API
+# or a batch job) invalidates them on the next read; the TTL only bounds how
+# long entries for old versions are kept around.
+DATA_CACHE_TTL = 300
+
+def data_version():
+    return db.write_sequence()
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False)
+def load_statistics(version):
+    return db.get_statistics()
+
+@st.cache_data(ttl=DATA_CACHE_TTL, show_spinner=False, max_entries=256)
+def load_complaint_page(version, filters=None, columns=None, after_cursor=None, page_size=100):
+    return db.query_complaints(filters, list(columns), after_cursor, page_size)
+
+# ================= RENDER TIMINGS =================
+st.session_state.setdefault("section_timings", {})
+st.sidebar.toggle("⏱️ Show render timings", key="show_timings")
+
+@contextmanager
+def timed_section(name):
+    """Record how long a section takes to render, for the timing overlay."""
+    start = time.perf_counter()
+    yield
+    elapsed = (time.perf_counter() - start) * 1000
+    st.session_state.section_timings[name] = elapsed
+    metrics.observe("app." + name.lower().replace(" ", "_"), elapsed / 1000)
+    if st.session_state.show_timings:
+        st.caption(f"⏱️ {name}: {elapsed:.1f} ms")
 
 # ================= TABS =================
 tabs = st.tabs([
@@ -206,106 +276,90 @@ with tabs[0]:
             st.error("⚠️ Please fill all required fields")
         else:
             with st.spinner("🤖 AI is analyzing your complaint..."):
-                category = predict_category(complaint_text)
-                priority = get_priority(complaint_text)
-                department = get_department(category)
-                sentiment = get_sentiment(complaint_text)
-                keywords = extract_keywords(complaint_text)
-                resolution = estimate_resolution_time(category, priority)
-                ticket_id = generate_ticket_id()
-
-                submitted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
+                analysis = enrich([complaint_text], classifier=predictor)[0]
+                category = analysis["category"]
+                priority = analysis["priority"]
+                department = analysis["department"]
+                sentiment = analysis["sentiment"]
+                keywords = analysis["keywords"]
+                resolution = analysis["resolution_time"]
+                ticket_id = analysis["ticket_id"]
+
                 # Handle anonymous submission
                 display_name = "Anonymous" if anonymous else name
 
-                complaint_data = {
-                    "ticket_id": ticket_id,
-                    "name": display_name,
-                    "email": email,
-                    "phone": phone or "N/A",
-                    "complaint_text": complaint_text,
-                    "category": category,
-                    "priority": priority,
-                    "department": department,
-                    "sentiment_label": sentiment["label"],
-                    "sentiment_score": sentiment["score"],
-                    "keywords": ", ".join(keywords),
-                    "resolution_time": resolution,
-                    "status": "Pending",
-                    "submitted_at": submitted_at
-                }
-
-                db.add_complaint(complaint_data)
-
-            st.success("✅ Complaint registered successfully!")
-            st.markdown(f"### 🎫 Your Ticket ID: `{ticket_id}`")
-            st.balloons()
-            
-            # Display AI analysis results
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("📋 Category", category)
-                st.metric("⚡ Priority", priority)
-            with col2:
-                st.metric("🏢 Department", department)
-                st.metric("⏰ Est. Resolution", resolution)
-            with col3:
-                st.metric("💭 Sentiment", sentiment["label"])
-                st.metric("🔑 Keywords", len(keywords))
-            
-            st.info(f"🔑 **Keywords identified:** {', '.join(keywords)}")
-
-            pdf_path = generate_pdf_report(
-                ticket_id,
-                {
-                    "Name": display_name,
-                    "Email": email,
-                    "Phone": phone or "N/A",
-                    "Category": category,
-                    "Priority": priority,
-                    "Department": department,
-                    "Sentiment": sentiment["label"],
-                    "Keywords": ", ".join(keywords),
-                    "Estimated Resolution": resolution,
-                    "Status": "Pending",
-                    "Submitted At": submitted_at,
-                    "Complaint": complaint_text
-                }
-            )
+                complaint_data = complaint_record(analysis, display_name, email, complaint_text, phone=phone)
 
-            with open(pdf_path, "rb") as pdf:
-                st.download_button(
-                    "📄 Download Official Receipt (PDF)",
-                    data=pdf,
-                    file_name=f"Grievance_{ticket_id}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
-                )
-            
-            st.warning("⚠️ **Important:** Save your Ticket ID to track your complaint status")
+                # add_complaint returns False if the ticket ID is already
+                # taken; retry the rare clash with a fresh ID
+                for _ in range(3):
+                    if db.add_complaint(complaint_data):
+                        break
+                    ticket_id = complaint_data["ticket_id"] = generate_ticket_id()
+                else:
+                    ticket_id = None
+
+            if ticket_id is None:
+                st.error("❌ Your complaint could not be registered. Please try again.")
+            else:
+                # Start the receipt now; it renders while the results below are shown
+                receipt = renderer.submit(ticket_id, receipt_fields(complaint_data))
+
+                # Index the new complaint and link it if it repeats an earlier one
+                duplicate_index.sync(db)
+                duplicate = db.get_duplicate_links([ticket_id]).get(ticket_id)
+
+                st.success("✅ Complaint registered successfully!")
+                st.markdown(f"### 🎫 Your Ticket ID: `{ticket_id}`")
+                if duplicate:
+                    st.warning(f"🔁 This looks like a complaint already registered as "
+                               f"`{duplicate['duplicate_of']}` ({duplicate['similarity']:.0%} similar). "
+                               "It has been linked to that ticket so both are handled together.")
+                st.balloons()
+                
+                # Display AI analysis results
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("📋 Category", category)
+                    st.metric("⚡ Priority", priority)
+                with col2:
+                    st.metric("🏢 Department", department)
+                    st.metric("⏰ Est. Resolution", resolution)
+                with col3:
+                    st.metric("💭 Sentiment", sentiment["label"])
+                    st.metric("🔑 Keywords", len(keywords))
+                
+                st.info(f"🔑 **Keywords identified:** {', '.join(keywords)}")
+
+                receipt_download(receipt, "📄 Download Official Receipt (PDF)",
+                                 f"Grievance_{ticket_id}.pdf", use_container_width=True)
+                
+                st.warning("⚠️ **Important:** Save your Ticket ID to track your complaint status")
 
 # ================= TAB 2: DASHBOARD =================
-with tabs[1]:
-    st.markdown("## 📊 Analytics Dashboard")
-    
-    data = db.get_all_complaints()
-    if data:
-        df = pd.DataFrame(data)
+# Each section is a fragment that loads its own cached data, so a section
+# can rerun by itself without re-executing the rest of the page
+@st.fragment
+def dashboard_metrics():
+    with timed_section("Dashboard metrics"):
+        stats = load_statistics(data_version())
+        total = stats["total_complaints"] or 1
+        by_status = stats["by_status"]
+        by_priority = stats["by_priority"]
         
         # Metrics Row
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("📝 Total Complaints", len(df))
+            st.metric("📝 Total Complaints", stats["total_complaints"])
         with col2:
-            pending_count = (df["status"] == "Pending").sum()
+            pending_count = by_status.get("Pending", 0)
             st.metric("🟡 Pending", pending_count, delta="Needs Action" if pending_count > 0 else "All Clear")
         with col3:
-            in_progress = (df["status"] == "In Progress").sum()
+            in_progress = by_status.get("In Progress", 0)
             st.metric("🔵 In Progress", in_progress)
         with col4:
-            resolved = (df["status"] == "Resolved").sum()
-            resolution_pct = (resolved/len(df)*100) if len(df) > 0 else 0
+            resolved = by_status.get("Resolved", 0)
+            resolution_pct = resolved/total*100
             st.metric("✅ Resolved", resolved, delta=f"{resolution_pct:.0f}% Rate")
         
         st.markdown("---")
@@ -313,116 +367,367 @@ with tabs[1]:
         # Additional metrics
         col1, col2, col3 = st.columns(3)
         with col1:
-            critical = (df["priority"] == "Critical").sum()
+            critical = by_priority.get("Critical", 0)
             st.metric("🚨 Critical Priority", critical, delta="⚠️ Urgent" if critical > 0 else None)
         with col2:
-            avg_sentiment = df["sentiment_score"].mean() if "sentiment_score" in df.columns else 0
+            avg_sentiment = stats["avg_sentiment"]
             sentiment_label = "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral"
             st.metric("💭 Avg Sentiment", sentiment_label, delta=f"{avg_sentiment:.2f}")
         with col3:
-            today_complaints = len(df[df["submitted_at"].str.contains(datetime.now().strftime("%Y-%m-%d"))])
+            today_complaints = stats["by_date"].get(datetime.now().strftime("%Y-%m-%d"), 0)
             st.metric("📅 Today's Complaints", today_complaints)
-        
-        st.markdown("---")
-        
-        # Charts
+
+@st.fragment
+def dashboard_charts():
+    with timed_section("Dashboard charts"):
+        stats = load_statistics(data_version())
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("### 🏢 Complaints by Department")
-            st.bar_chart(df["department"].value_counts())
+            st.bar_chart(pd.Series(stats["by_department"]))
             
             st.markdown("### ⚡ Priority Distribution")
-            priority_data = df["priority"].value_counts()
-            st.bar_chart(priority_data)
+            st.bar_chart(pd.Series(stats["by_priority"]))
         
         with col2:
             st.markdown("### 📋 Complaints by Category")
-            st.bar_chart(df["category"].value_counts())
+            st.bar_chart(pd.Series(stats["by_category"]))
             
             st.markdown("### 📊 Status Overview")
-            status_data = df["status"].value_counts()
-            st.bar_chart(status_data)
-        
-        st.markdown("---")
+            st.bar_chart(pd.Series(stats["by_status"]))
+
+@st.fragment
+def dashboard_recent():
+    with timed_section("Recent complaints"):
         st.markdown("### 📌 Recent Complaints")
-        recent_df = df[["ticket_id", "name", "category", "priority", "status", "submitted_at"]].tail(10)
-        st.dataframe(recent_df, use_container_width=True, height=350)
+        page = load_complaint_page(
+            data_version(),
+            columns=("ticket_id", "name", "category", "priority", "status", "submitted_at"),
+            page_size=10
+        )
+        st.dataframe(pd.DataFrame(page["rows"]), use_container_width=True, height=350)
+
+@st.fragment
+def dashboard_quick_stats():
+    with timed_section("Quick statistics"):
+        stats = load_statistics(data_version())
+        total = stats["total_complaints"] or 1
+        by_priority = stats["by_priority"]
+        resolution_pct = stats["by_status"].get("Resolved", 0)/total*100
         
-        # Quick stats
+        # Quick stats (counters are ordered most frequent first)
         st.markdown("### 📈 Quick Statistics")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.info(f"**Most Common Category:**\n{df['category'].mode()[0]}")
+            st.info(f"**Most Common Category:**\n{next(iter(stats['by_category']), 'N/A')}")
         with col2:
-            st.info(f"**Most Assigned Dept:**\n{df['department'].mode()[0]}")
+            st.info(f"**Most Assigned Dept:**\n{next(iter(stats['by_department']), 'N/A')}")
         with col3:
-            high_priority = ((df["priority"] == "High").sum() + (df["priority"] == "Critical").sum())
+            high_priority = by_priority.get("High", 0) + by_priority.get("Critical", 0)
             st.warning(f"**High Priority Issues:**\n{high_priority}")
         with col4:
             st.success(f"**Resolution Rate:**\n{resolution_pct:.1f}%")
-        
+
+with tabs[1]:
+    st.markdown("## 📊 Analytics Dashboard")
+    
+    if load_statistics(data_version())["total_complaints"]:
+        dashboard_metrics()
+        st.markdown("---")
+        dashboard_charts()
+        st.markdown("---")
+        dashboard_recent()
+        dashboard_quick_stats()
     else:
         st.info("📭 No complaints registered yet. Submit the first complaint!")
 
 # ================= TAB 3: TRACK COMPLAINT =================
+# A fragment: tracking a ticket reruns only this tab
+@st.fragment
+def track_complaint():
+    with timed_section("Track complaint"):
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        ticket = st.text_input("Enter Your Ticket ID", placeholder="GRV-20260104120507123-XXXXXXXX")
+        
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            search_btn = st.button("🔎 Track Complaint", use_container_width=True)
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+        
+        if search_btn:
+            if not ticket:
+                st.warning("Please enter a ticket ID")
+            else:
+                res = db.get_complaint_by_ticket(ticket)
+                if res:
+                    st.success("✅ Complaint Found!")
+                    
+                    duplicate = db.get_duplicate_links([res["ticket_id"]]).get(res["ticket_id"])
+                    if duplicate:
+                        st.info(f"🔁 Linked as a duplicate of `{duplicate['duplicate_of']}` "
+                                f"({duplicate['similarity']:.0%} similar)")
+                    
+                    # Display complaint details in organized format
+                    st.markdown("### Complaint Details")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        st.markdown(f"**👤 Name:** {res['name']}")
+                        st.markdown(f"**📧 Email:** {res['email']}")
+                        st.markdown(f"**📱 Phone:** {res['phone']}")
+                        st.markdown(f"**📋 Category:** {res['category']}")
+                        st.markdown(f"**🏢 Department:** {res['department']}")
+                    
+                    with col2:
+                        st.markdown(f"**⚡ Priority:** {res['priority']}")
+                        st.markdown(f"**📊 Status:** {res['status']}")
+                        st.markdown(f"**⏰ Resolution Time:** {res['resolution_time']}")
+                        st.markdown(f"**📅 Submitted:** {res['submitted_at']}")
+                    
+                    # Reuses the cached receipt unless the complaint has changed
+                    receipt = renderer.submit(res["ticket_id"], receipt_fields(res))
+                    
+                    st.markdown("---")
+                    st.markdown("### Complaint Description")
+                    st.info(res['complaint_text'])
+                    
+                    # Status timeline
+                    st.markdown("### Status Timeline")
+                    if res['status'] == "Pending":
+                        st.progress(0.33)
+                        st.caption("🟡 Pending → ⚪ In Progress → ⚪ Resolved")
+                    elif res['status'] == "In Progress":
+                        st.progress(0.66)
+                        st.caption("✅ Pending → 🟡 In Progress → ⚪ Resolved")
+                    else:
+                        st.progress(1.0)
+                        st.caption("✅ Pending → ✅ In Progress → ✅ Resolved")
+                    
+                    receipt_download(receipt, "📄 Download Receipt (PDF)",
+                                     f"Grievance_{res['ticket_id']}.pdf", on_click="ignore")
+                else:
+                    st.error("❌ Ticket ID not found. Please check and try again.")
+
 with tabs[2]:
     st.markdown("## 🔍 Track Your Complaint")
-    
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    ticket = st.text_input("Enter Your Ticket ID", placeholder="GRV-20260104-XXXX")
-    
-    col1, col2 = st.columns([1, 3])
-    with col1:
-        search_btn = st.button("🔎 Track Complaint", use_container_width=True)
-    
-    st.markdown("</div>", unsafe_allow_html=True)
-    
-    if search_btn:
-        if not ticket:
-            st.warning("Please enter a ticket ID")
-        else:
-            res = db.get_complaint_by_ticket(ticket)
-            if res:
-                st.success("✅ Complaint Found!")
-                
-                # Display complaint details in organized format
-                st.markdown("### Complaint Details")
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown(f"**👤 Name:** {res['name']}")
-                    st.markdown(f"**📧 Email:** {res['email']}")
-                    st.markdown(f"**📱 Phone:** {res['phone']}")
-                    st.markdown(f"**📋 Category:** {res['category']}")
-                    st.markdown(f"**🏢 Department:** {res['department']}")
-                
-                with col2:
-                    st.markdown(f"**⚡ Priority:** {res['priority']}")
-                    st.markdown(f"**📊 Status:** {res['status']}")
-                    st.markdown(f"**⏰ Resolution Time:** {res['resolution_time']}")
-                    st.markdown(f"**📅 Submitted:** {res['submitted_at']}")
-                
-                st.markdown("---")
-                st.markdown("### Complaint Description")
-                st.info(res['complaint_text'])
-                
-                # Status timeline
-                st.markdown("### Status Timeline")
-                if res['status'] == "Pending":
-                    st.progress(0.33)
-                    st.caption("🟡 Pending → ⚪ In Progress → ⚪ Resolved")
-                elif res['status'] == "In Progress":
-                    st.progress(0.66)
-                    st.caption("✅ Pending → 🟡 In Progress → ⚪ Resolved")
-                else:
-                    st.progress(1.0)
-                    st.caption("✅ Pending → ✅ In Progress → ✅ Resolved")
-            else:
-                st.error("❌ Ticket ID not found. Please check and try again.")
+    track_complaint()
 
 # ================= TAB 4: ADMIN PANEL =================
+@st.fragment
+def admin_metrics():
+    with timed_section("Admin metrics"):
+        stats = load_statistics(data_version())
+        total = stats["total_complaints"] or 1
+        by_priority = stats["by_priority"]
+        by_status = stats["by_status"]
+        
+        # Admin Metrics
+        st.markdown("### 📈 Quick Statistics")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        
+        with col1:
+            st.metric("Total", stats["total_complaints"])
+        with col2:
+            critical = by_priority.get("Critical", 0)
+            st.metric("Critical", critical, delta="High Priority" if critical > 0 else None)
+        with col3:
+            st.metric("High", by_priority.get("High", 0))
+        with col4:
+            pending = by_status.get("Pending", 0)
+            st.metric("Pending", pending, delta="Needs Action" if pending > 0 else None)
+        with col5:
+            resolved = by_status.get("Resolved", 0)
+            resolution_rate = f"{(resolved/total*100):.1f}%"
+            st.metric("Resolved", f"{resolved} ({resolution_rate})")
+
+# Filtering and paging rerun only the listing
+@st.fragment
+def admin_listing():
+    with timed_section("Admin listing"):
+        # Filters
+        st.markdown("### 🔍 Filter Complaints")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            filter_status = st.selectbox(
+                "Filter by Status",
+                ["All", "Pending", "In Progress", "Resolved"]
+            )
+        
+        with col2:
+            filter_priority = st.selectbox(
+                "Filter by Priority",
+                ["All", "Critical", "High", "Medium", "Low"]
+            )
+        
+        with col3:
+            filter_category = st.selectbox(
+                "Filter by Category",
+                ["All"] + sorted(load_statistics(data_version())["by_category"])
+            )
+        
+        filters = {
+            "status": filter_status,
+            "priority": filter_priority,
+            "category": filter_category,
+        }
+        
+        # Keyset pagination: remember the cursor each visited page started
+        # from, and start over whenever the filters change
+        if st.session_state.get("admin_filters") != filters:
+            st.session_state.admin_filters = filters
+            st.session_state.admin_cursors = [None]
+        cursors = st.session_state.admin_cursors
+        
+        page = load_complaint_page(
+            data_version(),
+            filters,
+            columns=("ticket_id", "name", "email", "category", "priority",
+                     "status", "department", "submitted_at"),
+            after_cursor=cursors[-1],
+            page_size=ADMIN_PAGE_SIZE
+        )
+        
+        st.markdown(f"### 📋 All Complaints (page {len(cursors)})")
+        
+        # Display complaints table
+        st.dataframe(
+            pd.DataFrame(page["rows"]),
+            use_container_width=True,
+            height=400
+        )
+        
+        # Callbacks move the cursor before the fragment reruns
+        col1, col2, col3 = st.columns([1, 1, 3])
+        with col1:
+            st.button("⬅️ Previous", disabled=len(cursors) == 1, use_container_width=True,
+                      on_click=cursors.pop)
+        with col2:
+            st.button("Next ➡️", disabled=page["next_cursor"] is None, use_container_width=True,
+                      on_click=cursors.append, args=(page["next_cursor"],))
+
+@st.fragment
+def admin_update_status():
+    with timed_section("Update status"):
+        st.markdown("### ✏️ Update Complaint Status")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            update_ticket = st.text_input(
+                "Ticket ID to Update",
+                placeholder="GRV-20260104120507123-XXXXXXXX"
+            )
+        
+        with col2:
+            new_status = st.selectbox(
+                "New Status",
+                ["Pending", "In Progress", "Resolved"],
+                index=1
+            )
+        
+        with col3:
+            st.write("")  # Spacing
+            st.write("")  # Spacing
+            if st.button("🔄 Update Status", use_container_width=True):
+                if update_ticket:
+                    if db.update_complaint_status(update_ticket, new_status):
+                        st.success(f"✅ Status updated to '{new_status}' for ticket {update_ticket}")
+                        # The write moved the data version: redraw every section
+                        st.rerun()
+                    else:
+                        st.error("❌ Invalid Ticket ID")
+                else:
+                    st.warning("Please enter a Ticket ID")
+
+@st.fragment
+def admin_bulk_actions():
+    with timed_section("Bulk actions"):
+        st.markdown("### 🔧 Bulk Actions")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Parquet needs the optional pyarrow package
+            export_formats = [f for f in db.EXPORT_FORMATS if f != "parquet" or find_spec("pyarrow")]
+            export_format = st.selectbox(
+                "Export Format",
+                export_formats,
+                index=1,
+                format_func={"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}.get
+            )
+            mime, extension = db.EXPORT_FORMATS[export_format]
+
+            def export_file():
+                # Streamlit serves downloads from memory, so the whole file
+                # is held here; the chunked export only bounds the database
+                # read. gzip keeps it small; for very large tables run
+                # db.export_complaints() from a script and stream to disk.
+                buffer = io.BytesIO()
+                for chunk in db.export_complaints(export_format):
+                    buffer.write(chunk)
+                return buffer.getvalue()
+
+            # A callable is only run when the button is clicked
+            st.download_button(
+                "📥 Export All Data",
+                export_file,
+                file_name=f"grievances_export_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                mime=mime,
+                use_container_width=True,
+                on_click="ignore"
+            )
+        
+        with col2:
+            st.info(f"💾 Database: {load_statistics(data_version())['total_complaints']} total records")
+            
+            # Bulk dedupe pass: re-index every complaint and relink duplicates
+            if st.button("🔁 Find Duplicates", use_container_width=True):
+                with st.spinner("Comparing complaints..."):
+                    summary = duplicate_index.rebuild(db)
+                st.success(f"✅ {summary['duplicates']} duplicates of {summary['groups']} complaints "
+                           f"among {summary['complaints']}")
+                most_repeated = db.count_duplicates_by_original(10)
+                if most_repeated:
+                    st.dataframe(pd.Series(most_repeated, name="duplicates"), use_container_width=True)
+
+@st.fragment
+def admin_performance():
+    with timed_section("Performance metrics"):
+        st.markdown("### 📡 Performance Metrics")
+        st.caption("Recorded by this app server process since it started. "
+                   "The HTTP API serves its own at /metrics.")
+        
+        snapshot = metrics.snapshot()
+        if not metrics.is_enabled():
+            st.info("Metrics are disabled (GRIEVANCE_METRICS=0)")
+        elif not snapshot["operations"]:
+            st.info("Nothing recorded yet")
+        else:
+            st.dataframe(
+                pd.DataFrame.from_dict(snapshot["operations"], orient="index").round(2),
+                use_container_width=True
+            )
+            if snapshot["counters"]:
+                st.dataframe(pd.Series(snapshot["counters"], name="count"), use_container_width=True)
+        
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
+        with col1:
+            st.button("🔄 Refresh", key="metrics_refresh", use_container_width=True)
+        with col2:
+            st.button("🗑️ Reset", key="metrics_reset", on_click=metrics.reset, use_container_width=True)
+        with col3:
+            st.download_button(
+                "📥 Prometheus",
+                metrics.prometheus_text,
+                file_name="grievance_metrics.prom",
+                mime="text/plain",
+                use_container_width=True,
+                on_click="ignore"
+            )
+
 with tabs[3]:
     st.markdown("## ⚙️ Admin Control Panel")
     
@@ -461,131 +766,31 @@ with tabs[3]:
         
         st.markdown("---")
         
-        # Get all complaints
-        complaints = db.get_all_complaints()
-        
-        if complaints:
-            df = pd.DataFrame(complaints)
-            
-            # Admin Metrics
-            st.markdown("### 📈 Quick Statistics")
-            col1, col2, col3, col4, col5 = st.columns(5)
-            
-            with col1:
-                st.metric("Total", len(df))
-            with col2:
-                critical = (df["priority"] == "Critical").sum()
-                st.metric("Critical", critical, delta="High Priority" if critical > 0 else None)
-            with col3:
-                st.metric("High", (df["priority"] == "High").sum())
-            with col4:
-                pending = (df["status"] == "Pending").sum()
-                st.metric("Pending", pending, delta="Needs Action" if pending > 0 else None)
-            with col5:
-                resolved = (df["status"] == "Resolved").sum()
-                resolution_rate = f"{(resolved/len(df)*100):.1f}%"
-                st.metric("Resolved", f"{resolved} ({resolution_rate})")
-            
+        # Counts for the whole table; listings below are fetched page by page
+        if load_statistics(data_version())["total_complaints"]:
+            admin_metrics()
             st.markdown("---")
-            
-            # Filters
-            st.markdown("### 🔍 Filter Complaints")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                filter_status = st.selectbox(
-                    "Filter by Status",
-                    ["All", "Pending", "In Progress", "Resolved"]
-                )
-            
-            with col2:
-                filter_priority = st.selectbox(
-                    "Filter by Priority",
-                    ["All", "Critical", "High", "Medium", "Low"]
-                )
-            
-            with col3:
-                filter_category = st.selectbox(
-                    "Filter by Category",
-                    ["All"] + list(df["category"].unique())
-                )
-            
-            # Apply filters
-            filtered_df = df.copy()
-            if filter_status != "All":
-                filtered_df = filtered_df[filtered_df["status"] == filter_status]
-            if filter_priority != "All":
-                filtered_df = filtered_df[filtered_df["priority"] == filter_priority]
-            if filter_category != "All":
-                filtered_df = filtered_df[filtered_df["category"] == filter_category]
-            
-            st.markdown(f"### 📋 All Complaints ({len(filtered_df)} records)")
-            
-            # Display complaints table
-            st.dataframe(
-                filtered_df[[
-                    "ticket_id", "name", "email", "category", "priority", 
-                    "status", "department", "submitted_at"
-                ]],
-                use_container_width=True,
-                height=400
-            )
-            
+            admin_listing()
             st.markdown("---")
-            
-            # Update Status Section
-            st.markdown("### ✏️ Update Complaint Status")
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                update_ticket = st.text_input(
-                    "Ticket ID to Update",
-                    placeholder="GRV-20260104-XXXX"
-                )
-            
-            with col2:
-                new_status = st.selectbox(
-                    "New Status",
-                    ["Pending", "In Progress", "Resolved"],
-                    index=1
-                )
-            
-            with col3:
-                st.write("")  # Spacing
-                st.write("")  # Spacing
-                if st.button("🔄 Update Status", use_container_width=True):
-                    if update_ticket:
-                        if db.update_complaint_status(update_ticket, new_status):
-                            st.success(f"✅ Status updated to '{new_status}' for ticket {update_ticket}")
-                            st.rerun()
-                        else:
-                            st.error("❌ Invalid Ticket ID")
-                    else:
-                        st.warning("Please enter a Ticket ID")
-            
+            admin_update_status()
             st.markdown("---")
-            
-            # Bulk Actions
-            st.markdown("### 🔧 Bulk Actions")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("📊 Export All Data (CSV)", use_container_width=True):
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        "📥 Download CSV",
-                        csv,
-                        file_name=f"grievances_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
-            
-            with col2:
-                st.info(f"💾 Database: {len(df)} total records")
-            
+            admin_bulk_actions()
+            st.markdown("---")
+            admin_performance()
         else:
             st.info("No complaints in the system yet")
 
+# ================= RENDER TIMINGS =================
+if st.session_state.get("show_timings"):
+    st.sidebar.markdown("### ⏱️ Render Timings")
+    st.sidebar.dataframe(
+        pd.Series(st.session_state.section_timings, name="ms").round(1),
+        use_container_width=True
+    )
+    st.sidebar.caption(
+        f"Full run: {(time.perf_counter() - run_started) * 1000:.1f} ms. "
+        "Sections inside fragments also update when they rerun on their own."
+    )
+
 # ================= FOOTER =================
 st.markdown("<hr><center>🇮🇳 National AI Redressal Framework | 2026</center>", unsafe_allow_html=True)
@@ -0,0 +1,330 @@
+"""
+Batch reports: department digests and bulk receipt archives.
+
+Both stream complaints out of GrievanceDatabase one keyset page at a time
+(query_complaints), so only one page of rows is ever held in memory. The
+digest PDF itself is built in memory by ReportLab until it is saved, as
+compressed page streams (roughly 0.5 KB per ticket).
+
+- render_digest() draws a multi-page PDF for one department (or all) over a
+  date range: summary tables of status, priority and category counts, then
+  every ticket, paginated as rows arrive.
+- render_receipts_zip() renders individual receipts for many tickets on a
+  process pool and writes them into a zip archive as batches complete.
+
+Usage:
+    python batch_reports.py digest --date 2026-01-04
+    python batch_reports.py digest --from 2026-01-01 --to 2026-01-07 --department "Health Department"
+    python batch_reports.py receipts --date 2026-01-04 --out receipts.zip
+"""
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from database import GrievanceDatabase
+from report_generator import render_receipt_bytes, receipt_fields
+
+
+DIGEST_DIR = "reports/digests"
+
+DIGEST_COLUMNS = ("ticket_id", "submitted_at", "category", "priority", "status", "complaint_text")
+
+# (header, row key, x position, width) of the ticket table
+TICKET_TABLE = (
+    ("Ticket ID", "ticket_id", 40, 130),
+    ("Submitted", "submitted_at", 170, 90),
+    ("Category", "category", 260, 80),
+    ("Priority", "priority", 340, 50),
+    ("Status", "status", 390, 55),
+    ("Complaint", "complaint_text", 445, 110),
+)
+
+ROW_HEIGHT = 14
+FONT = "Helvetica"
+FONT_SIZE = 8
+
+
+def iter_complaint_pages(db, filters=None, submitted_range=None, columns=None, page_size=500):
+    """Yield lists of complaint rows, newest first, one keyset page at a time."""
+    cursor = None
+    while True:
+        page = db.query_complaints(filters, columns, cursor, page_size, submitted_range)
+        if page["rows"]:
+            yield page["rows"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+def day_range(start, end=None):
+    """submitted_range covering the dates start..end inclusive ("YYYY-MM-DD")."""
+    end = end or start
+    next_day = date.fromisoformat(end) + timedelta(days=1)
+    return start, next_day.isoformat()
+
+
+_char_widths = {}
+
+
+def _char_width(ch):
+    width = _char_widths.get(ch)
+    if width is None:
+        width = _char_widths[ch] = stringWidth(ch, FONT, FONT_SIZE)
+    return width
+
+
+def _fit(text, width):
+    """Truncate text with an ellipsis to fit `width` points.
+
+    Widths are summed per character from a cache in one pass; the core
+    fonts have no kerning, so this matches stringWidth.
+    """
+    # No cell is wider than ~100 characters; don't normalize whole complaints
+    text = " ".join(str(text or "")[:200].split())
+    budget = width - _char_width(".") * 3
+    used = 0.0
+    cut = None
+    for i, ch in enumerate(text):
+        used += _char_width(ch)
+        if cut is None and used > budget:
+            cut = i
+        if used > width:
+            return text[:cut] + "..."
+    return text
+
+
+# ================= DEPARTMENT DIGEST =================
+class _DigestPages:
+    """Canvas wrapper that tracks the cursor and breaks pages."""
+
+    def __init__(self, output, title):
+        self.canvas = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+        self.width, self.height = A4
+        self.title = title
+        self.page = 1
+        self.y = self.height - 50
+
+    def ensure(self, space):
+        """Start a new page unless `space` points remain above the footer."""
+        if self.y - space < 60:
+            self.new_page()
+            return True
+        return False
+
+    def new_page(self):
+        self._footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = self.height - 50
+        self.canvas.setFont("Helvetica-Bold", 10)
+        self.canvas.drawString(40, self.y, self.title)
+        self.y -= 25
+
+    def _footer(self):
+        self.canvas.setFont("Helvetica-Oblique", 8)
+        self.canvas.drawCentredString(
+            self.width / 2, 35,
+            f"National AI Redressal Framework | 2026 | Page {self.page}"
+        )
+
+    def save(self):
+        self._footer()
+        self.canvas.save()
+
+
+def _draw_summary(pages, heading, counts, x, top):
+    """Two-column (value, count) table; returns the y below it."""
+    c = pages.canvas
+    y = top
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x, y, heading)
+    y -= ROW_HEIGHT
+    c.setFont(FONT, FONT_SIZE)
+    for value, count in counts.items():
+        c.drawString(x, y, _fit(value, 110))
+        c.drawRightString(x + 160, y, str(count))
+        y -= ROW_HEIGHT
+    return y
+
+
+def _draw_table_header(pages):
+    c = pages.canvas
+    c.setFont("Helvetica-Bold", FONT_SIZE)
+    for header, _, x, _ in TICKET_TABLE:
+        c.drawString(x, pages.y, header)
+    pages.y -= 4
+    c.line(40, pages.y, pages.width - 40, pages.y)
+    pages.y -= ROW_HEIGHT - 4
+    c.setFont(FONT, FONT_SIZE)
+
+
+def render_digest(db, output, department=None, submitted_range=None, page_size=500):
+    """
+    db              : GrievanceDatabase
+    output          : file path or binary file object for the PDF
+    department      : department to report on (None for all departments)
+    submitted_range : (start, end) on submitted_at, end exclusive (see day_range)
+    return          : number of tickets in the digest
+    """
+    filters = {"department": department}
+    start, end = submitted_range or (None, None)
+    title = f"Department Digest: {department or 'All Departments'}"
+
+    pages = _DigestPages(output, title)
+    c = pages.canvas
+
+    # ================= HEADER =================
+    c.setFont("Helvetica-Bold", 16)
+    c.drawCentredString(pages.width / 2, pages.y, "GOVERNMENT OF INDIA")
+    pages.y -= 25
+    c.setFont("Helvetica-Bold", 14)
+    c.drawCentredString(pages.width / 2, pages.y, title.upper())
+    pages.y -= 30
+
+    c.setFont("Helvetica", 10)
+    c.drawString(40, pages.y, f"Period: {start or 'beginning'} to {end or 'now'} (exclusive)")
+    pages.y -= 15
+    c.drawString(40, pages.y, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    pages.y -= 30
+
+    # ================= SUMMARY =================
+    summaries = [
+        (heading, db.count_complaints(column, filters, submitted_range))
+        for heading, column in (("By Status", "status"), ("By Priority", "priority"),
+                                ("By Category", "category"))
+    ]
+    total = sum(summaries[0][1].values())
+
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, pages.y, f"Total tickets: {total}")
+    pages.y -= 25
+
+    tallest = max(len(counts) for _, counts in summaries) + 1
+    pages.ensure(tallest * ROW_HEIGHT)
+    top = pages.y
+    pages.y = min(
+        _draw_summary(pages, heading, counts, 40 + i * 180, top)
+        for i, (heading, counts) in enumerate(summaries)
+    ) - 20
+
+    # ================= TICKETS =================
+    pages.ensure(3 * ROW_HEIGHT)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, pages.y, "Tickets (newest first)")
+    pages.y -= 20
+    _draw_table_header(pages)
+
+    for rows in iter_complaint_pages(db, filters, submitted_range, DIGEST_COLUMNS, page_size):
+        for row in rows:
+            if pages.ensure(ROW_HEIGHT):
+                _draw_table_header(pages)
+            for _, key, x, width in TICKET_TABLE:
+                c.drawString(x, pages.y, _fit(row[key], width - 5))
+            pages.y -= ROW_HEIGHT
+
+    pages.save()
+    return total
+
+
+def digest_path(directory, department, submitted_range):
+    slug = "".join(ch if ch.isalnum() else "_" for ch in department)
+    start, end = submitted_range
+    return os.path.join(directory, f"Digest_{slug}_{start}_{end}.pdf")
+
+
+def render_department_digests(db, submitted_range, directory=DIGEST_DIR):
+    """One digest PDF per department with tickets in the range.
+
+    Returns {department: file path}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for department in db.count_complaints("department", submitted_range=submitted_range):
+        path = digest_path(directory, department, submitted_range)
+        render_digest(db, path, department, submitted_range)
+        paths[department] = path
+    return paths
+
+
+# ================= BULK RECEIPTS =================
+def _render_receipt_batch(complaints):
+    """Worker: [(archive name, PDF bytes)] for a page of complaints."""
+    return [
+        (f"Grievance_{c['ticket_id']}.pdf", render_receipt_bytes(c["ticket_id"], receipt_fields(c)))
+        for c in complaints
+    ]
+
+
+def render_receipts_zip(db, output, filters=None, submitted_range=None,
+                        processes=None, page_size=200):
+    """Render the receipt of every matching complaint into a zip archive.
+
+    Pages of complaints are rendered on a process pool; at most two pages
+    per worker are in flight, and finished pages are written to the archive
+    in order, so memory is bounded by the window rather than the ticket
+    count. Returns the number of receipts written.
+    """
+    processes = processes or os.cpu_count() or 1
+    written = 0
+    with ZipFile(output, "w", ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal written
+            for name, pdf in pending.popleft().result():
+                archive.writestr(name, pdf)
+                written += 1
+
+        for rows in iter_complaint_pages(db, filters, submitted_range, page_size=page_size):
+            pending.append(pool.submit(_render_receipt_batch, rows))
+            if len(pending) >= 2 * processes:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch grievance reports")
+    parser.add_argument("mode", choices=["digest", "receipts"])
+    parser.add_argument("--date", help="single day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--department", help="digest a single department")
+    parser.add_argument("--out", help="output directory (digest) or zip file (receipts)")
+    parser.add_argument("--processes", type=int, default=None, help="receipt worker processes")
+    args = parser.parse_args()
+
+    start = args.start or args.date or date.today().isoformat()
+    submitted_range = day_range(start, args.end or args.date or start)
+    db = GrievanceDatabase()
+
+    if args.mode == "digest":
+        directory = args.out or DIGEST_DIR
+        if args.department:
+            os.makedirs(directory, exist_ok=True)
+            path = digest_path(directory, args.department, submitted_range)
+            count = render_digest(db, path, args.department, submitted_range)
+            print(f"✅ {args.department}: {count} tickets -> {path}")
+        else:
+            for department, path in render_department_digests(db, submitted_range, directory).items():
+                print(f"✅ {department} -> {path}")
+    else:
+        out = args.out or f"reports/receipts_{submitted_range[0]}.zip"
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        count = render_receipts_zip(db, out, {"department": args.department},
+                                    submitted_range, processes=args.processes)
+        print(f"✅ {count} receipts -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+"""
+Micro-benchmarks for the grievance pipeline.
+
+Usage:
+    python benchmark.py            # run every stage
+    python benchmark.py priority   # run selected stages
+"""
+import importlib.util
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import pandas as pd
+
+import dedupe
+import metrics
+import utils
+from inference import BatchPredictor
+from database import GrievanceDatabase
+
+
+def load_texts(path="data/cleaned_data.csv"):
+    """Complaint texts used as benchmark input."""
+    return pd.read_csv(path)["complaint_text"].astype(str).tolist()
+
+
+def timed(func, *args, repeat=3):
+    """Best wall time in seconds over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Budget for `import utils` in a fresh interpreter. Importing utils must not
+# pull in NLTK or touch the lexicon; that happens on the first sentiment call.
+IMPORT_BUDGET_MS = 150
+
+
+def report(label, seconds, count):
+    per_item_us = seconds / max(count, 1) * 1e6
+    print(f"   {label:<38} {per_item_us:>10.1f} us/complaint  ({count} complaints)")
+
+
+# --------------------------------------------------
+# IMPORT
+# --------------------------------------------------
+def measure_import_ms(module="utils"):
+    """Wall time of `import module` in a fresh interpreter, in milliseconds."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - start) * 1000); "
+        "import sys; print('nltk' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    return float(out[0]), out[1] == "True"
+
+
+def bench_import(texts):
+    elapsed, nltk_loaded = min(measure_import_ms() for _ in range(3))
+    status = "OK" if elapsed <= IMPORT_BUDGET_MS and not nltk_loaded else "OVER BUDGET"
+    print(f"   import utils: {elapsed:.1f} ms (budget {IMPORT_BUDGET_MS} ms, "
+          f"nltk loaded: {nltk_loaded}) -> {status}")
+    return status == "OK"
+
+
+# --------------------------------------------------
+# PRIORITY
+# --------------------------------------------------
+def _naive_priority(text):
+    """Reference implementation: sequential substring scans per tier."""
+    text = text.lower()
+    for tier in ("Critical", "High", "Medium"):
+        for keyword in utils.PRIORITY_KEYWORDS[tier]:
+            if keyword in text:
+                return tier
+    return "Low"
+
+
+def bench_priority(texts):
+    # Long complaints with no Critical terms are the worst case for the
+    # sequential scan, since it has to walk every keyword list.
+    filler = [t for t in texts if utils.get_priority(t) in ("Medium", "Low")]
+    rng = random.Random(42)
+    long_texts = [" ".join(rng.sample(filler, 40)) for _ in range(200)]
+
+    for label, sample in (("short", texts), ("long", long_texts)):
+        print(f"\n   [{label} texts, avg {sum(map(len, sample)) // len(sample)} chars]")
+        report("sequential scans", timed(lambda: [_naive_priority(t) for t in sample]), len(sample))
+
+        def cold():
+            utils._priority_word_hits.clear()
+            return [utils.get_priority(t) for t in sample]
+
+        report("get_priority (cold word cache)", timed(cold), len(sample))
+        report("get_priority", timed(lambda: [utils.get_priority(t) for t in sample]), len(sample))
+        report("get_priority_batch", timed(utils.get_priority_batch, sample), len(sample))
+
+
+# --------------------------------------------------
+# SENTIMENT
+# --------------------------------------------------
+def _fresh_analyzer_sentiment(text):
+    """Reference implementation: a new analyzer (and lexicon load) per call."""
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer().polarity_scores(text)
+
+
+def bench_sentiment(texts):
+    sample = texts[:100]
+    report("analyzer per call", timed(lambda: [_fresh_analyzer_sentiment(t) for t in sample], repeat=1), len(sample))
+
+    def cold(func):
+        utils.clear_sentiment_cache()
+        func()
+
+    report("get_sentiment (cold cache)", timed(lambda: cold(lambda: [utils.get_sentiment(t) for t in texts])), len(texts))
+    report("get_sentiment (warm cache)", timed(lambda: [utils.get_sentiment(t) for t in texts]), len(texts))
+
+    backfill = texts * 20
+    report("get_sentiment_batch (20x duplicates)", timed(lambda: cold(lambda: utils.get_sentiment_batch(backfill)), repeat=1), len(backfill))
+
+
+# --------------------------------------------------
+# ENRICH
+# --------------------------------------------------
+def _analyze_one_by_one(text):
+    category = "Administrative"
+    priority = utils.get_priority(text)
+    return (utils.get_department(category), priority, utils.get_sentiment(text),
+            utils.extract_keywords(text), utils.estimate_resolution_time(category, priority),
+            utils.generate_ticket_id())
+
+
+def bench_enrich(texts):
+    backfill = texts * 10
+
+    def cold(func):
+        utils.clear_sentiment_cache()
+        func()
+
+    report("analyzers one by one", timed(lambda: cold(lambda: [_analyze_one_by_one(t) for t in backfill])), len(backfill))
+    report("enrich", timed(lambda: cold(lambda: utils.enrich(backfill))), len(backfill))
+
+
+# --------------------------------------------------
+# INFERENCE
+# --------------------------------------------------
+def load_classifier(path="model/classifier.pkl"):
+    """The trained classifier, or a quick TF-IDF + LinearSVC stand-in."""
+    import joblib
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.svm import LinearSVC
+    data = pd.read_csv("data/cleaned_data.csv")
+    model = Pipeline([("tfidf", TfidfVectorizer(ngram_range=(1, 3))), ("clf", LinearSVC())])
+    return model.fit(data["complaint_text"], data["category"])
+
+
+def _concurrent_predicts(predict, texts, submitters):
+    """Each submitter thread predicts its share of texts one at a time."""
+    shares = [texts[i::submitters] for i in range(submitters)]
+    threads = [threading.Thread(target=lambda s=s: [predict([t]) for t in s]) for s in shares]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_inference(texts):
+    model = load_classifier()
+    sample = texts * 2
+
+    for submitters in (1, 8, 32):
+        print(f"\n   [{submitters} concurrent submitters]")
+        report("model.predict([text])", timed(_concurrent_predicts, model.predict, sample, submitters, repeat=1), len(sample))
+
+        predictor = BatchPredictor(model, max_batch_size=64, max_wait_ms=2)
+        report("BatchPredictor", timed(_concurrent_predicts, predictor.predict, sample, submitters, repeat=1), len(sample))
+        stats = predictor.stats()
+        predictor.close()
+        print(f"      avg batch {stats['avg_batch_size']:.1f}, max queue depth {stats['max_queue_depth']}, "
+              f"histogram {stats['batch_size_histogram']}")
+
+
+# --------------------------------------------------
+# DATABASE
+# --------------------------------------------------
+class _ConnectPerCallDatabase(GrievanceDatabase):
+    """Reference: a fresh rollback-journal connection for every call."""
+
+    @contextmanager
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def make_complaint(text, i):
+    return {
+        "ticket_id": f"BENCH-{i:09d}",
+        "name": "Benchmark User",
+        "email": "bench@example.com",
+        "phone": "N/A",
+        "complaint_text": text,
+        "category": random.choice(["Sanitation", "Utilities", "Healthcare", "Infrastructure"]),
+        "priority": random.choice(utils.PRIORITY_TIERS),
+        "department": "Public Works Department",
+        "sentiment_label": "Neutral",
+        "sentiment_score": 0.0,
+        "keywords": "",
+        "resolution_time": "2 days",
+        "status": "Pending",
+        "submitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def _mixed_workload(db, texts, writers=4, readers=4, ops=200):
+    """Concurrent writers (add_complaint) and readers (ticket lookups)."""
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def write():
+        for _ in range(ops):
+            with lock:
+                i = next(counter)
+            db.add_complaint(make_complaint(texts[i % len(texts)], i))
+
+    def read():
+        for j in range(ops):
+            db.get_complaint_by_ticket(f"BENCH-{j:09d}")
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return (writers + readers) * ops
+
+
+def bench_database(texts):
+    for label, cls in (("connect per call", _ConnectPerCallDatabase), ("pooled WAL", GrievanceDatabase)):
+        directory = tempfile.mkdtemp()
+        try:
+            db = cls(os.path.join(directory, "bench.db"))
+            start = time.perf_counter()
+            ops = _mixed_workload(db, texts)
+            elapsed = time.perf_counter() - start
+            print(f"   {label:<38} {ops / elapsed:>10.0f} ops/s  ({ops} mixed reads/writes)")
+        finally:
+            shutil.rmtree(directory)
+
+    records = [make_complaint(texts[i % len(texts)], i) for i in range(5000)]
+    for label, ingest in (("add_complaint per row", lambda db: [db.add_complaint(c) for c in records]),
+                          ("add_complaints_bulk", lambda db: db.add_complaints_bulk(records))):
+        directory = tempfile.mkdtemp()
+        try:
+            db = GrievanceDatabase(os.path.join(directory, "bench.db"))
+            report(label, timed(ingest, db, repeat=1), len(records))
+        finally:
+            shutil.rmtree(directory)
+
+
+# --------------------------------------------------
+# EXPORT
+# --------------------------------------------------
+# Peak Python memory allowed while exporting, at any table size
+EXPORT_MEMORY_BUDGET_MB = 64
+
+
+def _drain_export(db, fmt):
+    """Consume an export; return (seconds, bytes, peak traced MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in db.export_complaints(fmt))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def bench_export(texts):
+    formats = [f for f in GrievanceDatabase.EXPORT_FORMATS
+               if f != "parquet" or importlib.util.find_spec("pyarrow")]
+    ok = True
+    for rows in (20000, 100000):
+        directory = tempfile.mkdtemp()
+        try:
+            db = GrievanceDatabase(os.path.join(directory, "bench.db"))
+            db.add_complaints_bulk(make_complaint(texts[i % len(texts)], i) for i in range(rows))
+            print(f"\n   [{rows} rows]")
+            for fmt in formats:
+                elapsed, size, peak = _drain_export(db, fmt)
+                ok = ok and peak <= EXPORT_MEMORY_BUDGET_MB
+                report(f"export {fmt} ({size / 2 ** 20:.1f} MiB, peak {peak:.0f} MiB)", elapsed, rows)
+        finally:
+            shutil.rmtree(directory)
+    print(f"   peak memory budget {EXPORT_MEMORY_BUDGET_MB} MiB -> {'OK' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+# --------------------------------------------------
+# TICKET IDS
+# --------------------------------------------------
+def _legacy_ticket_id():
+    """Reference: second-resolution timestamp plus a random 4-digit suffix."""
+    return f"GRV-{time.strftime('%Y%m%d%H%M%S')}-{random.randint(1000, 9999)}"
+
+
+TICKET_GENERATORS = {"timestamp + random": _legacy_ticket_id, "generate_ticket_id": utils.generate_ticket_id}
+
+
+def _ticket_writer(db_path, generator, threads, per_thread):
+    """One writer process: `threads` threads each filing `per_thread`
+    complaints. Returns the number add_complaint rejected."""
+    db = GrievanceDatabase(db_path)
+    new_id = TICKET_GENERATORS[generator]
+    if generator == "generate_ticket_id":
+        utils.claim_ticket_worker(db)
+    rejected = []
+
+    def write():
+        for i in range(per_thread):
+            complaint = make_complaint("ticket load test", i)
+            complaint["ticket_id"] = new_id()
+            if not db.add_complaint(complaint):
+                rejected.append(complaint["ticket_id"])
+
+    workers = [threading.Thread(target=write) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return len(rejected)
+
+
+def bench_tickets(texts, processes=4, threads=4, per_thread=300):
+    start = time.perf_counter()
+    ids = [utils.generate_ticket_id() for _ in range(100000)]
+    elapsed = time.perf_counter() - start
+    print(f"   generate_ticket_id: {len(ids) / elapsed:,.0f} ids/s, "
+          f"unique: {len(set(ids)) == len(ids)}, time-ordered: {ids == sorted(ids)}")
+
+    ok = True
+    total = processes * threads * per_thread
+    for generator in TICKET_GENERATORS:
+        directory = tempfile.mkdtemp()
+        try:
+            db_path = os.path.join(directory, "bench.db")
+            GrievanceDatabase(db_path)
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                rejected = sum(pool.map(_ticket_writer, [db_path] * processes, [generator] * processes,
+                                        [threads] * processes, [per_thread] * processes))
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory)
+        print(f"   {generator:<24} {total / elapsed:>8.0f} inserts/s, "
+              f"{rejected} of {total} rejected as duplicate ticket IDs "
+              f"({processes} processes x {threads} threads)")
+        if generator == "generate_ticket_id":
+            ok = rejected == 0
+    return ok
+
+
+# --------------------------------------------------
+# HTTP API
+# --------------------------------------------------
+def bench_api(texts):
+    import api
+    report = api.run_load_test(requests=1000, concurrency=32)
+    api.print_load_report(report)
+    return report["total"]["errors"] == 0
+
+
+# --------------------------------------------------
+# METRICS
+# --------------------------------------------------
+# Added cost per call of a @metrics.timed function while recording is off
+METRICS_DISABLED_BUDGET_NS = 250
+
+
+def _noop():
+    return None
+
+
+def _per_call_ns(func, calls=200000):
+    return timed(lambda: [func() for _ in range(calls)]) / calls * 1e9
+
+
+def bench_metrics(texts):
+    was_enabled = metrics.is_enabled()
+    decorated = metrics.timed("bench.noop")(_noop)
+
+    def with_timer():
+        with metrics.timer("bench.block"):
+            pass
+
+    baseline = _per_call_ns(_noop)
+    results = {}
+    try:
+        for state, toggle in (("disabled", metrics.disable), ("enabled", metrics.enable)):
+            toggle()
+            results[state] = _per_call_ns(decorated) - baseline
+            print(f"   @timed ({state}):  +{results[state]:6.0f} ns/call   "
+                  f"timer() ({state}): +{_per_call_ns(with_timer) - baseline:6.0f} ns/call")
+    finally:
+        (metrics.enable if was_enabled else metrics.disable)()
+        metrics.reset()
+
+    ok = results["disabled"] <= METRICS_DISABLED_BUDGET_NS
+    print(f"   disabled overhead budget {METRICS_DISABLED_BUDGET_NS} ns -> {'OK' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+# --------------------------------------------------
+# DUPLICATE DETECTION
+# --------------------------------------------------
+# Per-complaint cost of checking a new complaint against the index
+DEDUPE_QUERY_BUDGET_US = 1000
+
+
+def bench_dedupe(texts, sizes=(10000, 100000)):
+    from synthetic_data import synthetic_complaints
+
+    ok = True
+    for size in sizes:
+        rows = [{"id": i + 1, "ticket_id": c["ticket_id"], "complaint_text": c["complaint_text"]}
+                for i, c in enumerate(synthetic_complaints(size))]
+        index = dedupe.DuplicateIndex(None)
+        start = time.perf_counter()
+        links = index.add(rows)
+        elapsed = time.perf_counter() - start
+        print(f"\n   [{size} indexed complaints]")
+        report(f"bulk pass ({len(links)} duplicates)", elapsed, size)
+
+        probes = [c["complaint_text"] for c in synthetic_complaints(2000, seed=7)]
+        seconds = timed(lambda: [index.query(t) for t in probes])
+        report("query", seconds, len(probes))
+        ok = ok and seconds / len(probes) * 1e6 <= DEDUPE_QUERY_BUDGET_US
+    print(f"   query budget {DEDUPE_QUERY_BUDGET_US} us -> {'OK' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+STAGES = {
+    "import": bench_import,
+    "priority": bench_priority,
+    "sentiment": bench_sentiment,
+    "enrich": bench_enrich,
+    "inference": bench_inference,
+    "database": bench_database,
+    "export": bench_export,
+    "tickets": bench_tickets,
+    "api": bench_api,
+    "metrics": bench_metrics,
+    "dedupe": bench_dedupe,
+}
+
+
+def main(selected):
+    texts = load_texts()
+    ok = True
+    for name in selected or STAGES:
+        print(f"\n[{name}]")
+        ok = STAGES[name](texts) is not False and ok
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1:]) else 1)
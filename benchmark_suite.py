@@ -0,0 +1,421 @@
+"""
+Offline benchmark suite: throughput and memory of each pipeline stage at
+several data sizes, on synthetic complaints (see synthetic_data.py).
+
+Every (stage, size) run happens in a fresh interpreter, so caches, pools and
+memory high-water marks never carry over from one run to the next. Database
+stages run against a fixture of `size` synthetic rows, built once per size
+and seed and reused by later runs. The fixtures use a fixed date range, so
+every commit is measured on the same data.
+
+Memory is the process's peak resident set size. For database stages it
+includes SQLite's memory-mapped file pages (up to the mmap_size in
+CONNECTION_PRAGMAS), which are reclaimable rather than allocated.
+
+Results are written as JSON. Pass an earlier results file with --compare to
+flag stages whose throughput dropped (or memory grew) beyond --threshold;
+the exit status is 1 if any did.
+
+Usage:
+    python benchmark_suite.py
+    python benchmark_suite.py --sizes 1000,100000,1000000 --stages priority,statistics
+    python benchmark_suite.py --output after.json --compare before.json
+
+benchmark.py holds the micro-benchmarks that compare each optimisation with
+the implementation it replaced.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SUITE_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 100000)
+RESULTS_DIR = "benchmarks/results"
+FIXTURE_DIR = "benchmarks/fixtures"
+
+# Fixture rows are spread over the year before this date
+FIXTURE_END = datetime(2026, 1, 1)
+
+# Most items one run of a stage processes, for stages whose cost per item
+# does not depend on the data size; None measures all `size` items
+STAGE_LIMITS = {
+    "synthesize": 200000,
+    "sentiment": 200000,
+    "enrich": 200000,
+    "add_complaint": 20000,
+    "bulk_insert": 200000,
+    "pdf_report": 500,
+}
+
+
+def _max_rss_mb():
+    """Peak resident memory of this process so far, in MiB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 1024
+
+
+def _texts(count, seed):
+    from synthetic_data import synthetic_texts
+    return [text for text, _ in synthetic_texts(count, seed)]
+
+
+def _records(count, seed):
+    from synthetic_data import synthetic_complaints
+    return list(synthetic_complaints(count, seed, end=FIXTURE_END))
+
+
+# Scratch directories of the current run, removed when it finishes
+_scratch_dirs = []
+
+
+def _scratch_dir():
+    directory = tempfile.mkdtemp(prefix="grievance-bench-")
+    _scratch_dirs.append(directory)
+    return directory
+
+
+def _copy_fixture(fixture):
+    """Private copy of a fixture database, for stages that write."""
+    path = os.path.join(_scratch_dir(), "bench.db")
+    shutil.copyfile(fixture, path)
+    return path
+
+
+# --------------------------------------------------
+# STAGES
+# --------------------------------------------------
+# Each stage does its setup and returns (items, run): run() is the timed
+# part and processes `items` complaints (or calls).
+
+def stage_synthesize(count, seed, fixture):
+    from synthetic_data import synthetic_complaints
+    return count, lambda: sum(1 for _ in synthetic_complaints(count, seed, end=FIXTURE_END))
+
+
+def stage_priority(count, seed, fixture):
+    from utils import get_priority
+    texts = _texts(count, seed)
+    return count, lambda: [get_priority(t) for t in texts]
+
+
+def stage_sentiment(count, seed, fixture):
+    from utils import clear_sentiment_cache, get_sentiment
+    texts = _texts(count, seed)
+    get_sentiment("warm up the analyzer")
+    clear_sentiment_cache()
+    return count, lambda: [get_sentiment(t) for t in texts]
+
+
+def stage_keywords(count, seed, fixture):
+    from utils import extract_keywords
+    texts = _texts(count, seed)
+    return count, lambda: [extract_keywords(t) for t in texts]
+
+
+def stage_predict(count, seed, fixture):
+    from benchmark import load_classifier
+    model = load_classifier()
+    texts = _texts(count, seed)
+
+    def run():
+        for start in range(0, len(texts), 1000):
+            model.predict(texts[start:start + 1000])
+
+    return count, run
+
+
+def stage_enrich(count, seed, fixture):
+    from benchmark import load_classifier
+    from utils import enrich
+    model = load_classifier()
+    texts = _texts(count, seed)
+    return count, lambda: enrich(texts, classifier=model)
+
+
+def stage_add_complaint(count, seed, fixture):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(_copy_fixture(fixture))
+    records = _records(count, seed + 1)
+    for r in records:
+        r["ticket_id"] = "NEW-" + r["ticket_id"]
+    return count, lambda: [db.add_complaint(r) for r in records]
+
+
+def stage_bulk_insert(count, seed, fixture):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(_copy_fixture(fixture))
+    records = _records(count, seed + 1)
+    for r in records:
+        r["ticket_id"] = "NEW-" + r["ticket_id"]
+    return count, lambda: db.add_complaints_bulk(records)
+
+
+def stage_statistics(count, seed, fixture, calls=50):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(fixture)
+    # max_age=0 recomputes every call instead of reusing the cached copy
+    return calls, lambda: [db.get_statistics(max_age=0) for _ in range(calls)]
+
+
+def stage_query_pages(count, seed, fixture, pages=50, page_size=100):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(fixture)
+    filters = {"status": "Pending"}
+    rows = min(pages * page_size, db.count_complaints("status", filters).get("Pending", 0))
+
+    def run():
+        cursor = None
+        for _ in range(pages):
+            page = db.query_complaints(filters, after_cursor=cursor, page_size=page_size)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    return rows, run
+
+
+def stage_search(count, seed, fixture, queries=("water supply", "garbage", "street lights", "hospital")):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(fixture)
+    return len(queries), lambda: [db.search_complaints(q) for q in queries]
+
+
+def stage_export(count, seed, fixture):
+    from database import GrievanceDatabase
+    db = GrievanceDatabase(fixture)
+    return count, lambda: sum(len(chunk) for chunk in db.export_complaints("csv.gz"))
+
+
+def stage_dedupe(count, seed, fixture):
+    from database import GrievanceDatabase
+    from dedupe import DuplicateIndex, index_path
+    path = _copy_fixture(fixture)
+    db = GrievanceDatabase(path)
+    index = DuplicateIndex(index_path(path))
+    return count, lambda: index.rebuild(db)
+
+
+def stage_pdf_report(count, seed, fixture):
+    from report_generator import generate_pdf_report, receipt_fields
+    records = _records(count, seed)
+    # generate_pdf_report writes under ./reports; keep that out of the repo
+    os.chdir(_scratch_dir())
+    return count, lambda: [generate_pdf_report(r["ticket_id"], receipt_fields(r)) for r in records]
+
+
+STAGES = {
+    "synthesize": stage_synthesize,
+    "priority": stage_priority,
+    "sentiment": stage_sentiment,
+    "keywords": stage_keywords,
+    "predict": stage_predict,
+    "enrich": stage_enrich,
+    "add_complaint": stage_add_complaint,
+    "bulk_insert": stage_bulk_insert,
+    "statistics": stage_statistics,
+    "query_pages": stage_query_pages,
+    "search": stage_search,
+    "export": stage_export,
+    "dedupe": stage_dedupe,
+    "pdf_report": stage_pdf_report,
+}
+
+# Stages that run against the fixture database of each size
+DATABASE_STAGES = {"add_complaint", "bulk_insert", "statistics", "query_pages", "search", "export",
+                   "dedupe"}
+
+
+def _run_stage(stage, size, seed, fixture):
+    """Worker: set up and time one stage in this (fresh) process."""
+    limit = STAGE_LIMITS.get(stage)
+    count = min(size, limit) if limit else size
+    cwd = os.getcwd()
+    try:
+        items, run = STAGES[stage](count, seed, fixture)
+
+        rss_before = _max_rss_mb()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        rss_after = _max_rss_mb()
+    finally:
+        os.chdir(cwd)
+        while _scratch_dirs:
+            shutil.rmtree(_scratch_dirs.pop(), ignore_errors=True)
+
+    return {
+        "items": items,
+        "seconds": round(seconds, 6),
+        "items_per_s": round(items / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        # Growth of the high-water mark during the timed part alone
+        "stage_rss_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }
+
+
+def build_fixture(size, seed, directory=FIXTURE_DIR):
+    """Path of a database holding `size` synthetic complaints, built if missing."""
+    from database import GrievanceDatabase
+    from synthetic_data import synthetic_complaints
+
+    path = os.path.join(directory, f"synthetic-{size}-seed{seed}.db")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".building"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    db = GrievanceDatabase(tmp_path)
+    db.add_complaints_bulk(synthetic_complaints(size, seed, end=FIXTURE_END), chunk_size=5000)
+    with db.get_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode=DELETE")
+    db.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def run_suite(stages, sizes, seed=42, repeat=1, fixture_dir=FIXTURE_DIR):
+    """Run every stage at every size; returns the results document."""
+    commit, dirty = _git_commit()
+    document = {
+        "suite_version": SUITE_VERSION,
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "sizes": list(sizes),
+        "results": {},
+    }
+    spawn = get_context("spawn")
+
+    for size in sizes:
+        fixture = None
+        if DATABASE_STAGES.intersection(stages):
+            start = time.perf_counter()
+            fixture = build_fixture(size, seed, fixture_dir)
+            print(f"\n[{size} rows] fixture {fixture} ({time.perf_counter() - start:.1f}s)")
+        else:
+            print(f"\n[{size} rows]")
+
+        for stage in stages:
+            best = None
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    result = pool.submit(_run_stage, stage, size, seed, fixture).result()
+                if best is None or result["seconds"] < best["seconds"]:
+                    best = result
+            document["results"].setdefault(stage, {})[str(size)] = best
+            print(f"   {stage:<14} {best['items_per_s'] or 0:>12,.0f} items/s  "
+                  f"({best['items']} items, {best['seconds']:.3f}s, "
+                  f"peak {best['peak_rss_mb']} MiB, +{best['stage_rss_mb']} MiB)")
+
+    return document
+
+
+def compare(current, baseline, threshold=0.2, memory_floor_mb=8):
+    """Print throughput and memory against a baseline results document.
+
+    A stage regresses when its throughput drops by more than `threshold`
+    or its timed-part memory grows by more than `threshold` (and more than
+    `memory_floor_mb`, so small absolute changes aren't flagged). Returns
+    the list of regressions as (stage, size, message).
+    """
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for stage, by_size in current["results"].items():
+        for size, result in by_size.items():
+            before = baseline.get("results", {}).get(stage, {}).get(size)
+            if not before or not before.get("items_per_s") or not result.get("items_per_s"):
+                continue
+            ratio = result["items_per_s"] / before["items_per_s"]
+            line = f"   {stage:<14} {size:>8}  throughput x{ratio:.2f}"
+            if ratio < 1 - threshold:
+                regressions.append((stage, size, f"throughput x{ratio:.2f}"))
+                line += "  <-- REGRESSION"
+
+            mem, mem_before = result.get("stage_rss_mb"), before.get("stage_rss_mb")
+            if mem is not None and mem_before is not None:
+                line += f", memory {mem_before} -> {mem} MiB"
+                if mem - mem_before > max(memory_floor_mb, threshold * mem_before):
+                    regressions.append((stage, size, f"memory {mem_before} -> {mem} MiB"))
+                    line += "  <-- REGRESSION"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline grievance pipeline benchmark suite")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated data sizes in complaints")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the fastest is kept")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="where fixture databases are kept")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change counted as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    document = run_suite(stages, sizes, args.seed, args.repeat, args.fixtures)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{document['commit'] or 'nogit'}-{datetime.now():%Y%m%d%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(document, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+"""
+Compact, memory-mappable inference artifact for the complaint classifier.
+
+The pickled classifier carries fitted TfidfVectorizers (including their
+`stop_words_` sets of every pruned n-gram), Python tree objects for the
+random forest / gradient boosting members, and float64 weights. Unpickling
+it on every worker cold start is slow, and each process holds a private copy.
+
+export_compact() flattens the model into plain arrays in a directory:
+
+    manifest.json        structure: feature sets, members, how they combine
+    fs{i}_terms.npy      sorted vocabulary (fixed-width UTF-8 bytes)
+    fs{i}_idf.npy        idf weights
+    m{j}_*.npy           member weights (float32 coefficients, flat tree arrays)
+
+Arrays are stored uncompressed and opened with mmap_mode='r', so worker
+processes share the same page-cache pages. Vocabulary lookups use
+np.searchsorted on the sorted term array, so no per-process dict is built.
+
+Supported models: Pipeline(tfidf, clf), SharedTfidfVoting, PrefitStacking
+and OnlineComplaintClassifier, with LogisticRegression, LinearSVC,
+SGDClassifier, MultinomialNB, RandomForestClassifier and
+GradientBoostingClassifier members.
+"""
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import normalize
+
+from ensemble import PrefitStacking, SharedTfidfVoting
+from training import stack_method
+
+
+COMPACT_MODEL_DIR = "model/compact"
+
+# Vectorizer settings that affect tokenization and weighting at inference
+ANALYZER_PARAMS = ("lowercase", "strip_accents", "stop_words", "token_pattern",
+                   "ngram_range", "analyzer")
+WEIGHTING_PARAMS = ("binary", "sublinear_tf", "norm", "use_idf")
+HASHING_PARAMS = ANALYZER_PARAMS + ("n_features", "binary", "norm", "alternate_sign")
+
+
+# --------------------------------------------------
+# EXPORT
+# --------------------------------------------------
+class _Exporter:
+    def __init__(self, directory):
+        self.directory = directory
+        self.feature_sets = []
+        self.members = []
+        self._feature_keys = {}
+
+    def save(self, name, array):
+        np.save(os.path.join(self.directory, f"{name}.npy"), np.ascontiguousarray(array))
+        return name
+
+    def feature_set(self, vectorizer):
+        """Export a fitted vectorizer once; return (index, column permutation)."""
+        key = id(vectorizer)
+        if key in self._feature_keys:
+            return self._feature_keys[key]
+
+        index = len(self.feature_sets)
+        params = vectorizer.get_params()
+        if params.get("tokenizer") or params.get("preprocessor") or callable(params["analyzer"]):
+            raise ValueError("custom tokenizers/analyzers cannot be exported")
+
+        if isinstance(vectorizer, HashingVectorizer):
+            spec = {"kind": "hashing", "params": {p: params[p] for p in HASHING_PARAMS}}
+            permutation = None
+        elif isinstance(vectorizer, TfidfVectorizer):
+            vocabulary = vectorizer.vocabulary_
+            # UTF-8 bytes sort in the same order as the code points they encode
+            ordered = sorted(vocabulary)
+            terms = np.array([t.encode("utf-8") for t in ordered])
+            # Sorted position -> original column, so weights can be reordered
+            permutation = np.array([vocabulary[t] for t in ordered])
+            spec = {
+                "kind": "tfidf",
+                "params": {p: params[p] for p in ANALYZER_PARAMS + WEIGHTING_PARAMS},
+                "terms": self.save(f"fs{index}_terms", terms),
+                "idf": self.save(f"fs{index}_idf", vectorizer.idf_),
+            }
+        else:
+            raise ValueError(f"unsupported vectorizer: {type(vectorizer).__name__}")
+
+        self.feature_sets.append(spec)
+        self._feature_keys[key] = (index, permutation)
+        return index, permutation
+
+    def member(self, clf, feature_set, permutation, n_features, name=None):
+        """Export one fitted classifier operating on a feature set's columns."""
+        j = name or f"m{len(self.members)}"
+        meta = "proba" if stack_method(clf) == "predict_proba" else "decision"
+        spec = {"feature_set": feature_set, "meta": meta}
+
+        if isinstance(clf, MultinomialNB):
+            coef, intercept = clf.feature_log_prob_, clf.class_log_prior_
+            spec["kind"] = "linear"
+        elif hasattr(clf, "coef_") and hasattr(clf, "intercept_"):
+            coef, intercept = clf.coef_, clf.intercept_
+            if coef.shape[0] == 1:
+                raise ValueError("binary linear models are not supported")
+            spec["kind"] = "linear"
+        elif isinstance(clf, RandomForestClassifier):
+            spec.update(kind="forest", **self._trees(j, [t.tree_ for t in clf.estimators_], permutation))
+        elif isinstance(clf, GradientBoostingClassifier):
+            if clf.estimators_.shape[1] == 1:
+                raise ValueError("binary gradient boosting is not supported")
+            trees = [t.tree_ for stage in clf.estimators_ for t in stage]
+            spec.update(kind="boosting", **self._trees(j, trees, permutation))
+            spec["learning_rate"] = float(clf.learning_rate)
+            spec["init"] = self.save(f"{j}_init", self._boosting_init(clf, n_features))
+        else:
+            raise ValueError(f"unsupported classifier: {type(clf).__name__}")
+
+        if spec["kind"] == "linear":
+            if permutation is not None:
+                coef = coef[:, permutation]
+            spec["coef"] = self.save(f"{j}_coef", np.asarray(coef, dtype=np.float32))
+            spec["intercept"] = self.save(f"{j}_intercept", np.asarray(intercept, dtype=np.float32))
+
+        return spec
+
+    def _trees(self, j, trees, permutation):
+        """Concatenate sklearn trees into flat node arrays."""
+        inverse = None
+        if permutation is not None:
+            inverse = np.empty_like(permutation)
+            inverse[permutation] = np.arange(len(permutation))
+
+        roots, offset = [], 0
+        feature, threshold, left, right, value = [], [], [], [], []
+        for tree in trees:
+            roots.append(offset)
+            is_leaf = tree.children_left == -1
+            f = np.where(is_leaf, 0, tree.feature)
+            feature.append(inverse[f] if inverse is not None else f)
+            # Thresholds stay float64: sklearn compares float32 inputs
+            # against float64 thresholds, and rounding them could flip splits
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            value.append(tree.value[:, 0, :])
+            offset += tree.node_count
+
+        depth = max(tree.max_depth for tree in trees)
+        return {
+            "n_trees": len(trees),
+            "max_depth": int(depth),
+            "roots": self.save(f"{j}_roots", np.array(roots, dtype=np.int32)),
+            "feature": self.save(f"{j}_feature", np.concatenate(feature).astype(np.int32)),
+            "threshold": self.save(f"{j}_threshold", np.concatenate(threshold)),
+            "left": self.save(f"{j}_left", np.concatenate(left).astype(np.int32)),
+            "right": self.save(f"{j}_right", np.concatenate(right).astype(np.int32)),
+            "value": self.save(f"{j}_value", np.concatenate(value)),
+        }
+
+    @staticmethod
+    def _boosting_init(clf, n_features):
+        """Raw score of the boosting init estimator, recovered from one sample."""
+        zero = sparse.csr_matrix((1, n_features))
+        total = np.array([
+            sum(clf.estimators_[s, k].predict(zero)[0] for s in range(clf.estimators_.shape[0]))
+            for k in range(clf.estimators_.shape[1])
+        ])
+        return clf.decision_function(zero)[0] - clf.learning_rate * total
+
+
+def _pipeline_parts(pipe):
+    if not isinstance(pipe, Pipeline) or len(pipe.steps) != 2:
+        raise ValueError("expected a Pipeline(vectorizer, classifier)")
+    return pipe.steps[0][1], pipe.steps[1][1]
+
+
+def _n_features(vectorizer):
+    if isinstance(vectorizer, HashingVectorizer):
+        return vectorizer.n_features
+    return len(vectorizer.vocabulary_)
+
+
+def export_compact(model, directory=COMPACT_MODEL_DIR):
+    """Write `model` as a compact artifact directory, replacing any old one."""
+    from online_model import OnlineComplaintClassifier
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=parent, prefix=".tmp-compact-")
+
+    try:
+        exporter = _Exporter(scratch)
+
+        def add(vectorizer, clf):
+            index, permutation = exporter.feature_set(vectorizer)
+            exporter.members.append(
+                exporter.member(clf, index, permutation, _n_features(vectorizer))
+            )
+
+        if isinstance(model, SharedTfidfVoting):
+            for clf, index in zip(model.estimators_, model.feature_index_):
+                add(model.vectorizers_[index], clf)
+            combine = {"type": "vote"}
+        elif isinstance(model, PrefitStacking):
+            for _, pipe in model.estimators:
+                add(*_pipeline_parts(pipe))
+            final = exporter.member(model.final_estimator, None, None, None, name="final")
+            combine = {"type": "stack", "final": final}
+        elif isinstance(model, OnlineComplaintClassifier):
+            add(model.vectorizer_, model.classifier_)
+            combine = {"type": "single"}
+        else:
+            add(*_pipeline_parts(model))
+            combine = {"type": "single"}
+
+        manifest = {
+            "format": 1,
+            "classes": [str(c) for c in model.classes_],
+            "feature_sets": exporter.feature_sets,
+            "members": exporter.members,
+            "combine": combine,
+        }
+        with open(os.path.join(scratch, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        # mkdtemp creates 0700; the app and API may run as another user
+        os.chmod(scratch, 0o755)
+
+        # Swap the new directory into place, then drop the old one
+        old = None
+        if os.path.exists(directory):
+            old = tempfile.mkdtemp(dir=parent, prefix=".old-compact-")
+            os.rmdir(old)
+            os.rename(directory, old)
+        os.rename(scratch, directory)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+
+    return directory
+
+
+# --------------------------------------------------
+# LOAD / PREDICT
+# --------------------------------------------------
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class _FeatureSet:
+    def __init__(self, spec, load):
+        params = spec["params"]
+        if spec["kind"] == "hashing":
+            self.hashing = HashingVectorizer(**{**params, "ngram_range": tuple(params["ngram_range"])})
+            return
+
+        self.hashing = None
+        self.params = params
+        self.analyze = TfidfVectorizer(
+            **{p: params[p] for p in ANALYZER_PARAMS if p != "ngram_range"},
+            ngram_range=tuple(params["ngram_range"])
+        ).build_analyzer()
+        self.terms = load(spec["terms"])
+        self.idf = load(spec["idf"])
+
+    def transform(self, texts):
+        if self.hashing is not None:
+            return self.hashing.transform(texts)
+
+        params = self.params
+        indptr, indices, values = [0], [], []
+        for text in texts:
+            counts = Counter(self.analyze(text))
+            if counts:
+                tokens = np.array([t.encode("utf-8") for t in counts])
+                positions = np.searchsorted(self.terms, tokens)
+                positions[positions == len(self.terms)] = 0
+                found = self.terms[positions] == tokens
+                tf = np.fromiter(counts.values(), dtype=np.float64)[found]
+                columns = positions[found]
+                indices.extend(columns)
+                values.extend(tf)
+            indptr.append(len(indices))
+
+        X = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), np.asarray(indices, dtype=np.int32), indptr),
+            shape=(len(indptr) - 1, len(self.terms))
+        )
+        X.sort_indices()
+        if params["binary"]:
+            X.data[:] = 1.0
+        if params["sublinear_tf"]:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if params["use_idf"]:
+            X.data *= self.idf[X.indices]
+        if params["norm"]:
+            X = normalize(X, norm=params["norm"], copy=False)
+        return X
+
+
+class _Member:
+    def __init__(self, spec, load):
+        self.spec = spec
+        self.kind = spec["kind"]
+        if self.kind == "linear":
+            self.coef = load(spec["coef"])
+            self.intercept = load(spec["intercept"])
+        else:
+            for name in ("roots", "feature", "threshold", "left", "right", "value"):
+                setattr(self, name, load(spec[name]))
+            if self.kind == "boosting":
+                self.init = load(spec["init"])
+
+    def _leaf_values(self, X):
+        """Sum of leaf values over all trees, shape (n_samples, n_columns)."""
+        X = sparse.csr_matrix(X)
+        used = np.unique(self.feature)
+        dense = X[:, used].toarray().astype(np.float32)
+        feature = np.searchsorted(used, self.feature)
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.spec["max_depth"]):
+            left = self.left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = dense[rows, feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        return self.value[nodes]
+
+    def scores(self, X):
+        """Decision scores, or class probabilities for forests."""
+        if self.kind == "linear":
+            return np.asarray(X @ self.coef.T, dtype=np.float64) + self.intercept
+        leaves = self._leaf_values(X)
+        if self.kind == "forest":
+            proba = leaves.sum(axis=1)
+            return proba / proba.sum(axis=1, keepdims=True)
+        # Boosting: one regression tree per (stage, class), laid out stage-major
+        n_classes = len(self.init)
+        raw = leaves[:, :, 0].reshape(X.shape[0], -1, n_classes).sum(axis=1)
+        return self.init + self.spec["learning_rate"] * raw
+
+    def meta(self, X):
+        """Stacking meta-features, matching training.meta_features."""
+        scores = self.scores(X)
+        if self.spec["meta"] == "proba" and self.kind != "forest":
+            return _softmax(scores)
+        return scores
+
+
+class CompactModel:
+    """Predict-only model loaded from an export_compact() directory."""
+
+    def __init__(self, directory=COMPACT_MODEL_DIR, mmap=True):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            self.manifest = json.load(f)
+
+        mode = "r" if mmap else None
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+
+        self.classes_ = np.array(self.manifest["classes"])
+        self.feature_sets = [_FeatureSet(spec, load) for spec in self.manifest["feature_sets"]]
+        self.members = [_Member(spec, load) for spec in self.manifest["members"]]
+        self.combine = self.manifest["combine"]
+        if self.combine["type"] == "stack":
+            self.final = _Member(self.combine["final"], load)
+
+    def predict(self, texts):
+        texts = list(texts)
+        features = [fs.transform(texts) for fs in self.feature_sets]
+        kind = self.combine["type"]
+
+        if kind == "single":
+            member = self.members[0]
+            return self.classes_[member.scores(features[member.spec["feature_set"]]).argmax(axis=1)]
+
+        if kind == "stack":
+            meta = np.hstack([m.meta(features[m.spec["feature_set"]]) for m in self.members])
+            return self.classes_[self.final.scores(meta).argmax(axis=1)]
+
+        # Hard vote; ties go to the lowest class index like VotingClassifier
+        counts = np.zeros((len(texts), len(self.classes_)), dtype=np.int32)
+        rows = np.arange(len(texts))
+        for member in self.members:
+            counts[rows, member.scores(features[member.spec["feature_set"]]).argmax(axis=1)] += 1
+        return self.classes_[counts.argmax(axis=1)]
+
+
+def load_compact(directory=COMPACT_MODEL_DIR):
+    return CompactModel(directory)
+
+
+def load_classifier(path="model/classifier.pkl", directory=COMPACT_MODEL_DIR):
+    """The deployed classifier, or None if none has been trained.
+
+    The memory-mapped compact export loads much faster and is shared
+    between worker processes; the pickle is used if the export is stale.
+    """
+    manifest = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest) and (
+        not os.path.exists(path) or os.path.getmtime(manifest) >= os.path.getmtime(path)
+    ):
+        return load_compact(directory)
+    if os.path.exists(path):
+        return joblib.load(path)
+    return None
@@ -1,32 +1,198 @@
 import sqlite3
+import csv
+import io
 import json
+import queue
+import re
+import zlib
+import threading
+import time
 from datetime import datetime
 import pandas as pd
 from contextlib import contextmanager
-from functools import lru_cache
 import os
 
+import metrics
+
+
+# Applied to every pooled connection. WAL lets readers run alongside a
+# writer; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only fsyncs at checkpoints.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MiB memory-mapped reads
+    "PRAGMA cache_size=-16384",     # 16 MiB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Statistics are recomputed when the database's write sequence moves (a
+# write from any process) or when the cached copy is older than this.
+STATISTICS_TTL = 60.0
+
+# Shared by every GrievanceDatabase in the process, keyed on the database
+# file: {path: (write sequence, computed at, stats)}
+_statistics_cache = {}
+_statistics_lock = threading.Lock()
+
+
+def _copy_statistics(stats):
+    """Copy of a statistics dict (scalars and flat count dicts) that shares
+    nothing with the cached one."""
+    return {key: dict(value) if isinstance(value, dict) else value
+            for key, value in stats.items()}
+
+
+# Search terms that can only be part of a ticket id
+_TICKET_FRAGMENT = re.compile(r"[\d-]*\d[\d-]*")
+
+
+# --------------------------------------------------
+# EXPORT ENCODERS
+# --------------------------------------------------
+def _csv_chunks(chunks, columns):
+    """Encode row chunks as UTF-8 CSV, header first."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _gzip_chunks(chunks, level=6):
+    """Gzip a byte stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ByteSink:
+    """Write-only file object whose contents are drained as they arrive."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+# Parquet types for the non-text complaint columns (resolution_time holds
+# strings such as "2 days" despite its INTEGER declaration)
+PARQUET_COLUMN_TYPES = {
+    "id": "int64",
+    "sentiment_score": "float64",
+}
+
+
+def _parquet_chunks(chunks, columns):
+    """Encode row chunks as a Parquet file, one row group per chunk."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([(c, PARQUET_COLUMN_TYPES.get(c, "string")) for c in columns])
+
+    def encode():
+        sink = _ByteSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        try:
+            for rows in chunks:
+                table = pa.Table.from_pydict(
+                    {c: [row[c] for row in rows] for c in columns}, schema=schema
+                )
+                writer.write_table(table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return encode()
+
 
 class GrievanceDatabase:
-    def __init__(self, db_path="data/grievances.db"):
+    def __init__(self, db_path="data/grievances.db", pool_size=8):
         self.db_path = db_path
 
         # Ensure data folder exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+        # Idle connections, reused across calls and threads
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
         self.init_database()
 
     # --------------------------------------------------
     # DB CONNECTION
     # --------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=10.0,
+            check_same_thread=False,
+            cached_statements=256,  # prepared statements reused per connection
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
+        """Borrow a pooled connection for the duration of the block.
+
+        Uncommitted work is rolled back when the block exits, matching the
+        old open-per-call behaviour where close() discarded it.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
         try:
             yield conn
         finally:
-            conn.close()
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._pool.put_nowait(conn)
+            except (sqlite3.Error, queue.Full):
+                conn.close()
+
+    def close(self):
+        """Close all idle pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
 
     # --------------------------------------------------
     # INIT DATABASE
@@ -69,61 +235,318 @@ class GrievanceDatabase:
 
             # Indexes
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket ON complaints(ticket_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON complaints(status)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_priority ON complaints(priority)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_category ON complaints(category)")
+
+            # Listing indexes: filter column(s) then the keyset order. The
+            # rowid (id) is implicitly the last column of every index.
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_submitted ON complaints(submitted_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_submitted ON complaints(status, submitted_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_priority_submitted ON complaints(priority, submitted_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_category_submitted ON complaints(category, submitted_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_priority_submitted "
+                           "ON complaints(status, priority, submitted_at)")
+
+            # Superseded by the composite indexes above
+            for index in ("idx_status", "idx_priority", "idx_category"):
+                cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+            self.fts_enabled = self._init_fts(cursor)
+            self._init_counters(cursor)
+            self._init_write_sequence(cursor)
+
+            # Near-duplicate complaints (see dedupe.py), linked to the
+            # earliest complaint about the same issue
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS duplicate_links (
+                    ticket_id TEXT PRIMARY KEY,
+                    duplicate_of TEXT NOT NULL,
+                    similarity REAL NOT NULL,
+                    linked_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_of ON duplicate_links(duplicate_of)")
+
+            # Ticket ID worker numbers leased to the processes writing here
+            # (see utils.claim_ticket_worker)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_workers (
+                    worker_id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    leased_until REAL NOT NULL
+                )
+            """)
 
             conn.commit()
 
+    def _init_fts(self, cursor):
+        """Create the FTS5 index over complaint text and keywords.
+
+        It is an external-content table (no second copy of the text) kept in
+        sync by triggers. Returns False if this SQLite build lacks FTS5.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaints_fts'"
+        ).fetchone()
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+                    complaint_text, keywords,
+                    content='complaints', content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            """)
+        except sqlite3.OperationalError:
+            return False
+
+        cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS complaints_fts_insert AFTER INSERT ON complaints BEGIN
+                INSERT INTO complaints_fts(rowid, complaint_text, keywords)
+                VALUES (new.id, new.complaint_text, new.keywords);
+            END;
+            CREATE TRIGGER IF NOT EXISTS complaints_fts_delete AFTER DELETE ON complaints BEGIN
+                INSERT INTO complaints_fts(complaints_fts, rowid, complaint_text, keywords)
+                VALUES ('delete', old.id, old.complaint_text, old.keywords);
+            END;
+            CREATE TRIGGER IF NOT EXISTS complaints_fts_update
+            AFTER UPDATE OF complaint_text, keywords ON complaints BEGIN
+                INSERT INTO complaints_fts(complaints_fts, rowid, complaint_text, keywords)
+                VALUES ('delete', old.id, old.complaint_text, old.keywords);
+                INSERT INTO complaints_fts(rowid, complaint_text, keywords)
+                VALUES (new.id, new.complaint_text, new.keywords);
+            END;
+        """)
+
+        # Index rows that existed before the FTS table was created
+        if not exists:
+            cursor.execute("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')")
+        return True
+
+    # Dimensions of the complaint_counts table: (dimension, column expression)
+    COUNTER_DIMENSIONS = (
+        ("total", "''"),
+        ("status", "{row}.status"),
+        ("category", "{row}.category"),
+        ("priority", "{row}.priority"),
+        ("department", "{row}.department"),
+        ("date", "substr({row}.submitted_at, 1, 10)"),
+    )
+
+    def _counter_upsert(self, row, sign):
+        """Trigger body adding (sign=1) or removing (sign=-1) one complaint."""
+        values = ",\n".join(
+            f"('{dimension}', COALESCE({expression.format(row=row)}, ''), {sign}, "
+            f"{sign} * COALESCE({row}.sentiment_score, 0))"
+            for dimension, expression in self.COUNTER_DIMENSIONS
+        )
+        return f"""
+            INSERT INTO complaint_counts (dimension, value, count, sentiment_sum)
+            VALUES {values}
+            ON CONFLICT(dimension, value) DO UPDATE SET
+                count = count + excluded.count,
+                sentiment_sum = sentiment_sum + excluded.sentiment_sum;
+        """
+
+    def _init_counters(self, cursor):
+        """Create the materialized complaint counters.
+
+        complaint_counts holds one row per (dimension, value), e.g.
+        ("status", "Pending"), with its complaint count and sentiment total.
+        Triggers keep it in step with every insert, update and delete inside
+        the writing transaction, so dashboard statistics are a read of a few
+        dozen rows however large the complaints table grows.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'complaint_counts'"
+        ).fetchone()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS complaint_counts (
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                sentiment_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            ) WITHOUT ROWID
+        """)
+
+        cursor.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS complaint_counts_insert AFTER INSERT ON complaints BEGIN
+                {self._counter_upsert("new", 1)}
+            END;
+            CREATE TRIGGER IF NOT EXISTS complaint_counts_delete AFTER DELETE ON complaints BEGIN
+                {self._counter_upsert("old", -1)}
+            END;
+            CREATE TRIGGER IF NOT EXISTS complaint_counts_update
+            AFTER UPDATE OF status, category, priority, department, submitted_at, sentiment_score
+            ON complaints BEGIN
+                {self._counter_upsert("old", -1)}
+                {self._counter_upsert("new", 1)}
+            END;
+        """)
+
+        # Count rows that existed before the counters were created
+        if not exists:
+            for dimension, expression in self.COUNTER_DIMENSIONS:
+                expression = expression.format(row="complaints")
+                cursor.execute(f"""
+                    INSERT INTO complaint_counts (dimension, value, count, sentiment_sum)
+                    SELECT '{dimension}', COALESCE({expression}, ''), COUNT(*),
+                           TOTAL(sentiment_score)
+                    FROM complaints
+                    GROUP BY 2
+                """)
+
+    def _init_write_sequence(self, cursor):
+        """A single-row counter bumped by every write to complaints.
+
+        Reading it is how any process notices that another one changed the
+        data since its cached statistics were computed.
+        """
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS write_sequence (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO write_sequence (id, seq) VALUES (1, 0);
+
+            CREATE TRIGGER IF NOT EXISTS write_sequence_insert AFTER INSERT ON complaints BEGIN
+                UPDATE write_sequence SET seq = seq + 1 WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS write_sequence_update AFTER UPDATE ON complaints BEGIN
+                UPDATE write_sequence SET seq = seq + 1 WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS write_sequence_delete AFTER DELETE ON complaints BEGIN
+                UPDATE write_sequence SET seq = seq + 1 WHERE id = 1;
+            END;
+        """)
+
     # --------------------------------------------------
     # ADD COMPLAINT
     # --------------------------------------------------
+    INSERT_COMPLAINT_SQL = """
+        INSERT INTO complaints (
+            ticket_id, name, email, phone,
+            complaint_text, category, priority,
+            department, sentiment_label, sentiment_score,
+            keywords, resolution_time, status, submitted_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    UPSERT_ANALYTICS_SQL = """
+        INSERT INTO analytics (date, category, priority, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(date, category, priority)
+        DO UPDATE SET count = count + excluded.count
+    """
+
+    @staticmethod
+    def _complaint_row(complaint):
+        return (
+            complaint["ticket_id"],
+            complaint["name"],
+            complaint["email"],
+            complaint["phone"],
+            complaint["complaint_text"],
+            complaint["category"],
+            complaint["priority"],
+            complaint["department"],
+            complaint["sentiment_label"],
+            complaint["sentiment_score"],
+            complaint["keywords"],
+            complaint["resolution_time"],
+            complaint.get("status", "Pending"),
+            complaint["submitted_at"]
+        )
+
+    @metrics.timed("db.add_complaint")
     def add_complaint(self, complaint):
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute("""
-                    INSERT INTO complaints (
-                        ticket_id, name, email, phone,
-                        complaint_text, category, priority,
-                        department, sentiment_label, sentiment_score,
-                        keywords, resolution_time, status, submitted_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    complaint["ticket_id"],
-                    complaint["name"],
-                    complaint["email"],
-                    complaint["phone"],
-                    complaint["complaint_text"],
-                    complaint["category"],
-                    complaint["priority"],
-                    complaint["department"],
-                    complaint["sentiment_label"],
-                    complaint["sentiment_score"],
-                    complaint["keywords"],
-                    complaint["resolution_time"],
-                    complaint.get("status", "Pending"),
-                    complaint["submitted_at"]
-                ))
+                cursor.execute(self.INSERT_COMPLAINT_SQL, self._complaint_row(complaint))
 
                 today = datetime.now().date().isoformat()
-                cursor.execute("""
-                    INSERT INTO analytics (date, category, priority, count)
-                    VALUES (?, ?, ?, 1)
-                    ON CONFLICT(date, category, priority)
-                    DO UPDATE SET count = count + 1
-                """, (today, complaint["category"], complaint["priority"]))
+                cursor.execute(self.UPSERT_ANALYTICS_SQL,
+                               (today, complaint["category"], complaint["priority"], 1))
 
                 conn.commit()
-                self.get_statistics.cache_clear()
                 return True
 
             except sqlite3.IntegrityError:
                 return False
 
+    # --------------------------------------------------
+    # BULK INGESTION
+    # --------------------------------------------------
+    @metrics.timed("db.add_complaints_bulk")
+    def add_complaints_bulk(self, complaints, chunk_size=500):
+        """Insert many complaints in a single transaction.
+
+        Records are consumed from any iterable in chunks of `chunk_size` and
+        written with executemany. Analytics counts are aggregated in memory
+        and upserted once per (date, category, priority), dated by each
+        complaint's submitted_at so historic backlogs land on their own days.
+        Complaints whose ticket_id already exists (in the table or earlier in
+        the same batch) are skipped.
+
+        Returns {"inserted": int, "duplicates": [ticket_id, ...]}. Any other
+        constraint violation rolls back the whole batch and is raised. The
+        write lock is taken before the first duplicate check, so a concurrent
+        insert cannot slip a ticket_id in between the check and the insert.
+        """
+        inserted = 0
+        duplicates = []
+        analytics = {}
+        seen = set()
+
+        def flush(conn, chunk):
+            nonlocal inserted
+            ticket_ids = [c["ticket_id"] for c in chunk]
+            existing = set()
+            for start in range(0, len(ticket_ids), 500):
+                part = ticket_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT ticket_id FROM complaints WHERE ticket_id IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                existing.update(row[0] for row in rows)
+
+            fresh = []
+            for complaint in chunk:
+                ticket_id = complaint["ticket_id"]
+                if ticket_id in existing or ticket_id in seen:
+                    duplicates.append(ticket_id)
+                    continue
+                seen.add(ticket_id)
+                fresh.append(complaint)
+
+                day = str(complaint.get("submitted_at") or "")[:10] or datetime.now().date().isoformat()
+                key = (day, complaint["category"], complaint["priority"])
+                analytics[key] = analytics.get(key, 0) + 1
+
+            conn.executemany(self.INSERT_COMPLAINT_SQL, [self._complaint_row(c) for c in fresh])
+            inserted += len(fresh)
+
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            chunk = []
+            for complaint in complaints:
+                chunk.append(complaint)
+                if len(chunk) >= chunk_size:
+                    flush(conn, chunk)
+                    chunk = []
+            if chunk:
+                flush(conn, chunk)
+
+            conn.executemany(self.UPSERT_ANALYTICS_SQL,
+                             [(*key, count) for key, count in analytics.items()])
+            conn.commit()
+
+        return {"inserted": inserted, "duplicates": duplicates}
+
     # --------------------------------------------------
     # GET ALL COMPLAINTS (ADMIN / DASHBOARD)
     # --------------------------------------------------
+    @metrics.timed("db.get_all_complaints")
     def get_all_complaints(self, limit=500):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -136,9 +559,165 @@ class GrievanceDatabase:
 
         return [dict(row) for row in rows]
 
+    # --------------------------------------------------
+    # FILTERED, PAGINATED LISTING (ADMIN / DASHBOARD)
+    # --------------------------------------------------
+    COMPLAINT_COLUMNS = (
+        "id", "ticket_id", "name", "email", "phone", "complaint_text",
+        "category", "priority", "department", "sentiment_label",
+        "sentiment_score", "keywords", "resolution_time", "status",
+        "submitted_at", "updated_at"
+    )
+    FILTER_COLUMNS = ("status", "priority", "category", "department")
+
+    def _filter_clauses(self, filters, submitted_range):
+        """WHERE clauses and parameters for query_complaints-style filters."""
+        where, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in self.FILTER_COLUMNS:
+                raise ValueError(f"Cannot filter on {column!r}")
+            if value is None or value == "All":
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            where.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+
+        start, end = submitted_range or (None, None)
+        if start is not None:
+            where.append("submitted_at >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("submitted_at < ?")
+            params.append(end)
+        return where, params
+
+    @metrics.timed("db.count_complaints")
+    def count_complaints(self, group_by, filters=None, submitted_range=None):
+        """{value: count} of `group_by` (one of FILTER_COLUMNS) over the
+        complaints matching the same filters as query_complaints."""
+        if group_by not in self.FILTER_COLUMNS:
+            raise ValueError(f"Cannot group by {group_by!r}")
+        where, params = self._filter_clauses(filters, submitted_range)
+        sql = f"SELECT {group_by}, COUNT(*) FROM complaints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" GROUP BY {group_by} ORDER BY COUNT(*) DESC, {group_by}"
+
+        with self.get_connection() as conn:
+            return dict(conn.execute(sql, params).fetchall())
+
+    @metrics.timed("db.query_complaints")
+    def query_complaints(self, filters=None, columns=None, after_cursor=None, page_size=100,
+                         submitted_range=None):
+        """One page of complaints, newest first, filtered in SQL.
+
+        filters         : {column: value or list of values} on FILTER_COLUMNS;
+                          None / "All" values are ignored
+        columns         : columns to return (default: all)
+        after_cursor    : the "next_cursor" of the previous page
+        page_size       : rows per page, or None for every matching row
+        submitted_range : (start, end) on submitted_at, start inclusive and
+                          end exclusive, e.g. ("2026-01-04", "2026-01-05");
+                          either side may be None
+
+        Pages use keyset pagination on (submitted_at, id), so deep pages cost
+        the same as the first one. Returns {"rows": [...], "next_cursor":
+        cursor or None when this was the last page}.
+        """
+        columns = list(columns or self.COMPLAINT_COLUMNS)
+        unknown = set(columns) - set(self.COMPLAINT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        # The keyset columns are always needed to build the next cursor
+        selected = columns + [c for c in ("submitted_at", "id") if c not in columns]
+
+        where, params = self._filter_clauses(filters, submitted_range)
+
+        if after_cursor is not None:
+            where.append("(submitted_at, id) < (?, ?)")
+            params.extend(after_cursor)
+
+        sql = f"SELECT {', '.join(selected)} FROM complaints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY submitted_at DESC, id DESC"
+        if page_size is not None:
+            # One extra row tells us whether another page exists
+            sql += " LIMIT ?"
+            params.append(page_size + 1)
+
+        with self.get_connection() as conn:
+            rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+        next_cursor = None
+        if page_size is not None and len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = (rows[-1]["submitted_at"], rows[-1]["id"])
+
+        extra = set(selected) - set(columns)
+        if extra:
+            for row in rows:
+                for column in extra:
+                    del row[column]
+
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    # --------------------------------------------------
+    # STREAM COMPLAINTS (TRAINING / BACKFILLS)
+    # --------------------------------------------------
+    def iter_complaints(self, after_id=0, columns=("id", "complaint_text", "category"),
+                        chunk_size=1000):
+        """Yield lists of complaint rows with id > after_id, in id order,
+        reading `chunk_size` rows at a time so memory stays flat."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {", ".join(columns)} FROM complaints
+                WHERE id > ?
+                ORDER BY id ASC
+            """, (after_id,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+
+    # --------------------------------------------------
+    # STREAMING EXPORT (ADMIN)
+    # --------------------------------------------------
+    # format -> (MIME type, file extension)
+    EXPORT_FORMATS = {
+        "csv": ("text/csv", "csv"),
+        "csv.gz": ("application/gzip", "csv.gz"),
+        "parquet": ("application/vnd.apache.parquet", "parquet"),
+    }
+
+    def export_complaints(self, fmt="csv", columns=None, chunk_size=10000):
+        """Export the whole complaints table as a generator of bytes.
+
+        Rows are read from one SELECT `chunk_size` at a time and encoded as
+        they arrive, so memory stays bounded by the chunk size rather than
+        the table size. fmt is "csv", "csv.gz" or "parquet" (needs pyarrow;
+        each chunk becomes one row group).
+        """
+        if fmt not in self.EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}, expected one of {list(self.EXPORT_FORMATS)}")
+        columns = list(columns or self.COMPLAINT_COLUMNS)
+        unknown = set(columns) - set(self.COMPLAINT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+        chunks = self.iter_complaints(columns=columns, chunk_size=chunk_size)
+        if fmt == "parquet":
+            return _parquet_chunks(chunks, columns)
+        if fmt == "csv.gz":
+            return _gzip_chunks(_csv_chunks(chunks, columns))
+        return _csv_chunks(chunks, columns)
+
     # --------------------------------------------------
     # GET COMPLAINT BY TICKET (TRACKING FIXED ✅)
     # --------------------------------------------------
+    @metrics.timed("db.get_complaint_by_ticket")
     def get_complaint_by_ticket(self, ticket_id):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -156,6 +735,7 @@ class GrievanceDatabase:
     # --------------------------------------------------
     # UPDATE STATUS (ADMIN)
     # --------------------------------------------------
+    @metrics.timed("db.update_complaint_status")
     def update_complaint_status(self, ticket_id, new_status):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -165,51 +745,230 @@ class GrievanceDatabase:
                 WHERE ticket_id = ?
             """, (new_status, ticket_id))
             conn.commit()
-            self.get_statistics.cache_clear()
 
         return cursor.rowcount > 0
 
     # --------------------------------------------------
     # STATISTICS (DASHBOARD)
     # --------------------------------------------------
-    @lru_cache(maxsize=1)
-    def get_statistics(self):
+    def write_sequence(self):
+        """Counter bumped by every write to complaints, from any process.
+
+        Callers can key their own caches on it to notice writes cheaply.
+        """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            stats = {}
+            return self._write_sequence(conn)
 
-            cursor.execute("SELECT COUNT(*) FROM complaints")
-            stats["total_complaints"] = cursor.fetchone()[0]
+    @staticmethod
+    def _write_sequence(conn):
+        return conn.execute("SELECT seq FROM write_sequence WHERE id = 1").fetchone()[0]
 
-            cursor.execute("SELECT status, COUNT(*) FROM complaints GROUP BY status")
-            stats["by_status"] = dict(cursor.fetchall())
+    @metrics.timed("db.get_statistics")
+    def get_statistics(self, max_age=STATISTICS_TTL):
+        """Dashboard counts, cached per database file across instances.
 
-            cursor.execute("SELECT category, COUNT(*) FROM complaints GROUP BY category")
-            stats["by_category"] = dict(cursor.fetchall())
+        The cached copy is reused until the write sequence changes or it is
+        older than `max_age` seconds, so each call costs a one-row read.
+        Callers get their own copy and may modify it.
+        """
+        key = os.path.abspath(self.db_path)
+        with self.get_connection() as conn:
+            # Read the sequence before the counts: a write landing in between
+            # only makes the cached stats newer than their sequence.
+            seq = self._write_sequence(conn)
+            with _statistics_lock:
+                cached = _statistics_cache.get(key)
+            if cached and cached[0] == seq and time.monotonic() - cached[1] < max_age:
+                metrics.increment("db.statistics_cache_hit")
+                return _copy_statistics(cached[2])
 
-            cursor.execute("SELECT priority, COUNT(*) FROM complaints GROUP BY priority")
-            stats["by_priority"] = dict(cursor.fetchall())
+            metrics.increment("db.statistics_cache_miss")
+            with metrics.timer("db.compute_statistics"):
+                stats = self._compute_statistics(conn)
 
-            cursor.execute("""
-                SELECT date, count FROM analytics
-                ORDER BY date ASC
-            """)
-            stats["recent_trend"] = dict(cursor.fetchall())
+        with _statistics_lock:
+            _statistics_cache[key] = (seq, time.monotonic(), stats)
+        return _copy_statistics(stats)
+
+    def _compute_statistics(self, conn):
+        """Read the materialized complaint_counts and analytics trend."""
+        cursor = conn.cursor()
+        stats = {
+            "total_complaints": 0,
+            "avg_sentiment": 0.0,
+            "by_status": {},
+            "by_category": {},
+            "by_priority": {},
+            "by_department": {},
+            "by_date": {},
+        }
+
+        cursor.execute("""
+            SELECT dimension, value, count, sentiment_sum
+            FROM complaint_counts
+            WHERE count > 0
+            ORDER BY dimension, count DESC, value
+        """)
+        for dimension, value, count, sentiment_sum in cursor.fetchall():
+            if dimension == "total":
+                stats["total_complaints"] = count
+                stats["avg_sentiment"] = sentiment_sum / count
+            else:
+                stats[f"by_{dimension}"][value] = count
+
+        cursor.execute("""
+            SELECT date, count FROM analytics
+            ORDER BY date ASC
+        """)
+        stats["recent_trend"] = dict(cursor.fetchall())
 
         return stats
 
+    # --------------------------------------------------
+    # TICKET WORKER LEASES
+    # --------------------------------------------------
+    def lease_ticket_worker(self, owner, duration, worker=None, max_workers=10000):
+        """Lease a ticket worker number to `owner` for `duration` seconds.
+
+        Renews `worker` if `owner` still holds it; otherwise takes the lowest
+        number that was never leased or whose lease has expired. Raises
+        RuntimeError when all `max_workers` numbers are leased.
+        """
+        now = time.time()
+        with self.get_connection() as conn:
+            # Write lock up front: two processes must not pick the same number
+            conn.execute("BEGIN IMMEDIATE")
+            if worker is not None:
+                renewed = conn.execute("""
+                    UPDATE ticket_workers SET leased_until = ?
+                    WHERE worker_id = ? AND owner = ?
+                """, (now + duration, worker, owner)).rowcount
+                if renewed:
+                    conn.commit()
+                    return worker
+
+            row = conn.execute("""
+                SELECT worker_id FROM ticket_workers
+                WHERE leased_until < ?
+                ORDER BY worker_id LIMIT 1
+            """, (now,)).fetchone()
+            if row is not None:
+                worker = row[0]
+            else:
+                worker = conn.execute(
+                    "SELECT COALESCE(MAX(worker_id) + 1, 0) FROM ticket_workers"
+                ).fetchone()[0]
+                if worker >= max_workers:
+                    raise RuntimeError(f"all {max_workers} ticket worker numbers are leased")
+
+            conn.execute("""
+                INSERT OR REPLACE INTO ticket_workers (worker_id, owner, leased_until)
+                VALUES (?, ?, ?)
+            """, (worker, owner, now + duration))
+            conn.commit()
+        return worker
+
+    # --------------------------------------------------
+    # DUPLICATE LINKS
+    # --------------------------------------------------
+    def link_duplicates(self, links, replace_all=False):
+        """Store (ticket_id, duplicate_of, similarity) links, replacing any
+        earlier link of the same ticket. replace_all drops every existing
+        link first, for a full dedupe pass."""
+        with self.get_connection() as conn:
+            if replace_all:
+                conn.execute("DELETE FROM duplicate_links")
+            conn.executemany("""
+                INSERT OR REPLACE INTO duplicate_links (ticket_id, duplicate_of, similarity)
+                VALUES (?, ?, ?)
+            """, links)
+            conn.commit()
+
+    def get_duplicate_links(self, ticket_ids):
+        """{ticket_id: {"duplicate_of", "similarity", "linked_at"}} for the
+        given tickets that are linked duplicates."""
+        ticket_ids = list(ticket_ids)
+        links = {}
+        with self.get_connection() as conn:
+            for start in range(0, len(ticket_ids), 500):
+                part = ticket_ids[start:start + 500]
+                rows = conn.execute(f"""
+                    SELECT ticket_id, duplicate_of, similarity, linked_at FROM duplicate_links
+                    WHERE ticket_id IN ({','.join('?' * len(part))})
+                """, part).fetchall()
+                for row in rows:
+                    links[row["ticket_id"]] = {k: row[k] for k in ("duplicate_of", "similarity", "linked_at")}
+        return links
+
+    def count_duplicates_by_original(self, limit=20):
+        """Tickets with the most linked duplicates: {ticket_id: count}."""
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT duplicate_of, COUNT(*) FROM duplicate_links
+                GROUP BY duplicate_of
+                ORDER BY COUNT(*) DESC, duplicate_of
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return {row[0]: row[1] for row in rows}
+
     # --------------------------------------------------
     # SEARCH (OPTIONAL)
     # --------------------------------------------------
-    def search_complaints(self, query):
+    @staticmethod
+    def _fts_query(query):
+        """Turn free text into an FTS5 prefix query: "water"* "supp"*"""
+        terms = re.findall(r"\w+", query)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @metrics.timed("db.search_complaints")
+    def search_complaints(self, query, limit=50, highlight=("**", "**")):
+        """Search complaints by ticket id prefix or by text.
+
+        Queries that look like a ticket id ("GRV-...") use the ticket_id index
+        as an exact/prefix range scan. Fragments of a ticket id (only digits
+        and dashes, e.g. "20260104" or "-0001") match anywhere in ticket_id
+        or the text with LIKE, since ticket ids are not in the FTS index.
+        Anything else is a BM25-ranked FTS5 search over complaint text and
+        keywords where every word matches as a prefix; each row gets a
+        "snippet" with the matches wrapped in `highlight` markers.
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
+
+            if query.upper().startswith("GRV-"):
+                prefix = query.upper()
+                cursor.execute("""
+                    SELECT * FROM complaints
+                    WHERE ticket_id >= ? AND ticket_id < ?
+                    ORDER BY ticket_id DESC
+                    LIMIT ?
+                """, (prefix, prefix + "\uffff", limit))
+                return [dict(row) for row in cursor.fetchall()]
+
+            match = self._fts_query(query)
+            if not self.fts_enabled or not match or _TICKET_FRAGMENT.fullmatch(query):
+                cursor.execute("""
+                    SELECT * FROM complaints
+                    WHERE complaint_text LIKE ? OR ticket_id LIKE ?
+                    ORDER BY submitted_at DESC
+                    LIMIT ?
+                """, (f"%{query}%", f"%{query}%", limit))
+                return [dict(row) for row in cursor.fetchall()]
+
             cursor.execute("""
-                SELECT * FROM complaints
-                WHERE complaint_text LIKE ? OR ticket_id LIKE ?
-                ORDER BY submitted_at DESC
-                LIMIT 50
-            """, (f"%{query}%", f"%{query}%"))
+                SELECT c.*,
+                       snippet(complaints_fts, 0, ?, ?, '…', 16) AS snippet,
+                       bm25(complaints_fts) AS rank
+                FROM complaints_fts
+                JOIN complaints c ON c.id = complaints_fts.rowid
+                WHERE complaints_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (highlight[0], highlight[1], match, limit))
             rows = cursor.fetchall()
 
         return [dict(row) for row in rows]
@@ -222,5 +981,5 @@ class GrievanceDatabase:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM complaints")
             cursor.execute("DELETE FROM analytics")
-            conn.commit()
-            self.get_statistics.cache_clear()
+            cursor.execute("DELETE FROM duplicate_links")
+            conn.commit()
\ No newline at end of file
@@ -0,0 +1,439 @@
+"""
+Near-duplicate complaint detection with MinHash and LSH.
+
+Each complaint is reduced to its set of character 5-grams ("shingles") and
+summarised by a MinHash signature of NUM_PERM 32-bit values. The fraction of
+equal values in two signatures estimates the Jaccard similarity of the
+shingle sets. Signatures are split into BANDS bands of ROWS values; two
+complaints become candidates if any band matches exactly, and candidates
+at or above DUPLICATE_THRESHOLD estimated similarity are duplicates. With
+16 bands of 4 rows, a pair at similarity 0.7 is a candidate 99% of the time
+and a pair at 0.3 about 12% of the time.
+
+DuplicateIndex keeps every signature in memory and appends each newly
+indexed complaint to a file next to the database (data/grievances.minhash),
+so restarts don't rehash the table. sync() indexes the complaints added
+since the last call, from any process, in id order. Processes sharing the
+file (the app and the API) take a lock on data/grievances.minhash.lock,
+read what the others appended and only then append their own records. A duplicate joins the
+group of the most similar earlier complaint and is linked to the group's
+first complaint through GrievanceDatabase.link_duplicates(). A bulk dedupe
+pass is the same thing starting from an empty index.
+
+Usage:
+    python dedupe.py                  # bulk pass over data/grievances.db
+    python dedupe.py --threshold 0.8 --dry-run
+"""
+import argparse
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process locking of the index file
+    fcntl = None
+
+import metrics
+from database import GrievanceDatabase
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.7
+HASH_SEED = 1
+
+# Ticket IDs are stored in fixed-width fields of the index file
+TICKET_WIDTH = 40
+
+_MAGIC = b"GRVMH\x00\x01\x00"
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MASK = np.uint64(0xFFFFFFFF)
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _permutations(num_perm=NUM_PERM, seed=HASH_SEED):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutations()
+
+# Mixes the ROWS values of a band into one 64-bit bucket key
+_BAND_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F,
+                      0x165667B19E3779F9, 0x27D4EB2F165667C5], dtype=np.uint64)[:ROWS]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Character `size`-grams of the lowercased text, punctuation folded
+    into single spaces."""
+    text = _NON_WORD.sub(" ", str(text or "").lower()).strip()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(text):
+    """MinHash signature of a complaint text: NUM_PERM uint32 values."""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    # Universal hashing (a*x + b) mod p, one row per permutation; uint64
+    # arithmetic wraps, which keeps the values well mixed
+    permuted = (_A * hashes + _B) % _MERSENNE & _MASK
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig):
+    """One 64-bit LSH bucket key per band of a signature."""
+    with np.errstate(over="ignore"):
+        return (sig.reshape(BANDS, ROWS).astype(np.uint64) * _BAND_MIX).sum(axis=1).tolist()
+
+
+def index_path(db_path):
+    """Index file kept next to the database: data/grievances.minhash."""
+    return os.path.splitext(db_path)[0] + ".minhash"
+
+
+RECORD = np.dtype([
+    ("id", "<i8"),           # complaints.id
+    ("root", "<i8"),         # id of the earliest complaint in its duplicate group
+    ("ticket", f"S{TICKET_WIDTH}"),
+    ("sig", "<u4", (NUM_PERM,)),
+])
+
+
+class DuplicateIndex:
+    """In-memory MinHash LSH index of complaints, persisted as an
+    append-only file of fixed-size records.
+
+    path      : index file (None keeps it in memory only)
+    threshold : estimated Jaccard similarity counted as a duplicate
+
+    Thread-safe; one instance can be shared by every session of a server.
+    """
+
+    def __init__(self, path=None, threshold=DUPLICATE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # The index file as last read: (inode, bytes consumed)
+        self._file_inode = None
+        self._file_offset = 0
+        self._clear()
+        if path:
+            with self._sync_lock, self._file_lock():
+                self._catch_up()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_id(self):
+        """Highest complaint id indexed so far."""
+        return self._last_id
+
+    def _clear(self):
+        self._size = 0
+        self._last_id = 0
+        self._sigs = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._ids = np.empty(1024, dtype=np.int64)
+        self._roots = []
+        self._tickets = []
+        self._rows = {}                               # complaint id -> row
+        self._buckets = [{} for _ in range(BANDS)]    # band key -> row or [rows]
+
+    # --------------------------------------------------
+    # PERSISTENCE
+    # --------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the index file across processes. The lock is
+        taken on a sidecar file because rebuilds replace the index file."""
+        if not self.path or fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        """Read the records appended to the index file since the last read,
+        starting over if it was replaced. Hold the file lock."""
+        if not os.path.exists(self.path):
+            if self._file_inode is not None:
+                with self._lock:
+                    self._clear()
+                self._file_inode, self._file_offset = None, 0
+            return
+
+        with open(self.path, "r+b") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._file_inode or stat.st_size < self._file_offset:
+                # Rebuilt by another process (or first read): load it whole
+                if self._file_inode is not None:
+                    with self._lock:
+                        self._clear()
+                self._file_inode, self._file_offset = stat.st_ino, 0
+            if self._file_offset == 0:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    # Not an index file (or an older format): start a new one
+                    self._file_inode = None
+                    self._rewrite()
+                    return
+                self._file_offset = len(_MAGIC)
+
+            f.seek(self._file_offset)
+            data = f.read()
+            whole = len(data) - len(data) % RECORD.itemsize
+            if whole < len(data):
+                # Torn final record from a crashed writer: cut it off so the
+                # next append stays aligned; sync() re-indexes the complaint
+                f.truncate(self._file_offset + whole)
+            records = np.frombuffer(data, dtype=RECORD, count=whole // RECORD.itemsize)
+            self._file_offset += whole
+
+        with self._lock:
+            for record in records:
+                if int(record["id"]) not in self._rows:
+                    self._insert(int(record["id"]), int(record["root"]),
+                                 record["ticket"].decode("utf-8"), record["sig"])
+
+    def _records(self, start, stop):
+        """Index rows start..stop as file records."""
+        rows = slice(start, stop)
+        records = np.zeros(stop - start, dtype=RECORD)
+        records["id"] = self._ids[rows]
+        records["root"] = self._roots[rows]
+        records["ticket"] = [t.encode("utf-8") for t in self._tickets[rows]]
+        records["sig"] = self._sigs[rows]
+        return records
+
+    def _append(self, start):
+        """Append index rows from `start` on to the file. Hold the file lock
+        and call _catch_up() first, so nothing is written twice."""
+        if not self.path or start >= self._size:
+            return
+        with self._lock:
+            data = self._records(start, self._size).tobytes()
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                f.write(_MAGIC)
+            f.write(data)
+            stat = os.fstat(f.fileno())
+        self._file_inode, self._file_offset = stat.st_ino, stat.st_size
+
+    def _rewrite(self):
+        """Replace the index file with the current contents. Hold the file
+        lock."""
+        if not self.path:
+            return
+        with self._lock:
+            data = self._records(0, self._size).tobytes()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._file_inode, self._file_offset = stat.st_ino, stat.st_size
+
+    # --------------------------------------------------
+    # INDEX
+    # --------------------------------------------------
+    def _insert(self, complaint_id, root, ticket_id, sig):
+        row = self._size
+        if row == len(self._ids):
+            self._sigs = np.resize(self._sigs, (row * 2, NUM_PERM))
+            self._ids = np.resize(self._ids, row * 2)
+        self._sigs[row] = sig
+        self._ids[row] = complaint_id
+        self._roots.append(root)
+        self._tickets.append(ticket_id)
+        self._rows[complaint_id] = row
+        self._size += 1
+        self._last_id = max(self._last_id, complaint_id)
+
+        for table, key in zip(self._buckets, band_keys(sig)):
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = row
+            elif isinstance(bucket, list):
+                bucket.append(row)
+            else:
+                table[key] = [bucket, row]
+
+    def _best_match(self, sig):
+        """(row, similarity) of the most similar indexed complaint at or
+        above the threshold, or None."""
+        candidates = set()
+        for table, key in zip(self._buckets, band_keys(sig)):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, list):
+                candidates.update(bucket)
+            else:
+                candidates.add(bucket)
+        if not candidates:
+            return None
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._sigs[rows] == sig).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] < self.threshold:
+            return None
+        return int(rows[best]), float(similarity[best])
+
+    @metrics.timed("dedupe.query")
+    def query(self, text):
+        """The indexed complaint most similar to `text`, if it is a duplicate:
+        {"ticket_id", "duplicate_of", "similarity"} where duplicate_of is the
+        earliest ticket of its group. None otherwise."""
+        sig = signature(text)
+        with self._lock:
+            match = self._best_match(sig)
+            if match is None:
+                return None
+            row, similarity = match
+            root_row = self._rows.get(self._roots[row], row)
+            return {"ticket_id": self._tickets[row],
+                    "duplicate_of": self._tickets[root_row],
+                    "similarity": round(similarity, 3)}
+
+    def add(self, complaints):
+        """Index complaints, in the given order, each checked against all
+        earlier ones. complaints are dicts with id, ticket_id and
+        complaint_text; already indexed ids are skipped. Only the in-memory
+        index changes; sync() and rebuild() write the file.
+
+        Returns [(ticket_id, duplicate_of, similarity)] for the duplicates,
+        duplicate_of being the earliest ticket of the group.
+        """
+        links = []
+        with self._lock:
+            for complaint in complaints:
+                complaint_id = int(complaint["id"])
+                if complaint_id in self._rows:
+                    continue
+                sig = signature(complaint["complaint_text"])
+                match = self._best_match(sig)
+                root = complaint_id
+                if match is not None:
+                    row, similarity = match
+                    root = self._roots[row]
+                    root_row = self._rows.get(root, row)
+                    links.append((complaint["ticket_id"], self._tickets[root_row], round(similarity, 3)))
+                self._insert(complaint_id, root, complaint["ticket_id"], sig)
+        return links
+
+    # --------------------------------------------------
+    # DATABASE
+    # --------------------------------------------------
+    def _is_stale(self, db):
+        """True if indexed complaints were deleted from the database (ids
+        are never reused, so the oldest remaining id tells)."""
+        if not self._size:
+            return False
+        first = next(db.iter_complaints(columns=("id",), chunk_size=1), None)
+        return first is None or first[0]["id"] > int(self._ids[:self._size].min())
+
+    @metrics.timed("dedupe.sync")
+    def sync(self, db, chunk_size=1000):
+        """Index complaints added to `db` since the last sync and link the
+        new duplicates in the database. Returns the links made by this call
+        as {ticket_id: {"duplicate_of", "similarity"}}; a concurrent call may
+        have indexed some new complaints already, so look links up with
+        db.get_duplicate_links() when they must be complete."""
+        with self._sync_lock, self._file_lock():
+            if self.path:
+                # Pick up what other processes indexed (and linked) already
+                self._catch_up()
+            if self._is_stale(db):
+                self._rebuild(db)
+                return {}
+
+            start = self._size
+            links = []
+            for rows in db.iter_complaints(after_id=self._last_id,
+                                           columns=("id", "ticket_id", "complaint_text"),
+                                           chunk_size=chunk_size):
+                links += self.add(rows)
+            self._append(start)
+            if links:
+                db.link_duplicates(links)
+                metrics.increment("dedupe.linked", len(links))
+        return {ticket: {"duplicate_of": original, "similarity": similarity}
+                for ticket, original, similarity in links}
+
+    def rebuild(self, db):
+        """Bulk dedupe pass: re-index the whole table from scratch and
+        replace every duplicate link. Returns a summary dict."""
+        with self._sync_lock, self._file_lock():
+            return self._rebuild(db)
+
+    def _rebuild(self, db):
+        with self._lock:
+            self._clear()
+        links = []
+        for rows in db.iter_complaints(columns=("id", "ticket_id", "complaint_text"),
+                                       chunk_size=5000):
+            links += self.add(rows)
+        self._rewrite()
+        db.link_duplicates(links, replace_all=True)
+        return {
+            "complaints": self._size,
+            "duplicates": len(links),
+            "groups": len({original for _, original, _ in links}),
+        }
+
+
+def open_index(db, threshold=DUPLICATE_THRESHOLD):
+    """The persisted index of a GrievanceDatabase, caught up with it."""
+    index = DuplicateIndex(index_path(db.db_path), threshold)
+    index.sync(db)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk near-duplicate pass over the complaints table")
+    parser.add_argument("--db", default="data/grievances.db", help="SQLite database path")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD,
+                        help=f"estimated Jaccard similarity counted as duplicate (default {DUPLICATE_THRESHOLD})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report duplicates without writing links or the index file")
+    args = parser.parse_args()
+
+    db = GrievanceDatabase(args.db)
+    if args.dry_run:
+        index = DuplicateIndex(None, args.threshold)
+        links = []
+        for rows in db.iter_complaints(columns=("id", "ticket_id", "complaint_text"), chunk_size=5000):
+            links += index.add(rows)
+        for ticket, original, similarity in links:
+            print(f"   {ticket} ~ {original} ({similarity:.2f})")
+        print(f"✅ {len(links)} duplicates of {len({o for _, o, _ in links})} complaints "
+              f"among {len(index)} (not saved)")
+        return
+
+    index = DuplicateIndex(index_path(args.db), args.threshold)
+    summary = index.rebuild(db)
+    print(f"✅ {summary['duplicates']} duplicates of {summary['groups']} complaints "
+          f"among {summary['complaints']}; index saved to {index.path}")
+    for ticket, count in db.count_duplicates_by_original(10).items():
+        print(f"   {ticket}: {count} duplicates")
+
+
+if __name__ == "__main__":
+    main()
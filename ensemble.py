@@ -0,0 +1,130 @@
+"""
+Voting ensemble that shares TF-IDF features between its members.
+
+Each Pipeline in train_model.py carries its own TfidfVectorizer, so a plain
+VotingClassifier tokenizes and n-grams every complaint once per member.
+SharedTfidfVoting fits one vectorizer per distinct TF-IDF configuration,
+transforms the input once per configuration and hands the same sparse
+matrix to every classifier that uses it. With identical configurations the
+features are identical, so predictions match the VotingClassifier built from
+the same pipelines.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+
+from training import meta_features
+
+
+def _vectorizer_key(vectorizer):
+    return repr(sorted(vectorizer.get_params().items()))
+
+
+class SharedTfidfVoting(ClassifierMixin, BaseEstimator):
+    """Hard-voting ensemble over classifiers that share vectorized features.
+
+    estimators : list of (name, vectorizer, classifier)
+    """
+
+    def __init__(self, estimators):
+        self.estimators = estimators
+
+    @classmethod
+    def from_pipelines(cls, estimators):
+        """Build from VotingClassifier-style [(name, Pipeline(tfidf, clf))]."""
+        return cls([
+            (name, clone(pipe.named_steps['tfidf']), clone(pipe.named_steps['clf']))
+            for name, pipe in estimators
+        ])
+
+    @classmethod
+    def from_fitted_pipelines(cls, estimators):
+        """Assemble a fitted ensemble from pipelines already fitted on the
+        same training data, without refitting anything. Pipelines whose
+        vectorizers share a configuration learned identical vocabularies,
+        so one of them is kept per configuration.
+        """
+        ensemble = cls.from_pipelines(estimators)
+        keys = {}
+        ensemble.vectorizers_ = []
+        ensemble.feature_index_ = []
+        ensemble.estimators_ = []
+        for _, pipe in estimators:
+            vectorizer = pipe.named_steps['tfidf']
+            key = _vectorizer_key(vectorizer)
+            if key not in keys:
+                keys[key] = len(ensemble.vectorizers_)
+                ensemble.vectorizers_.append(vectorizer)
+            ensemble.feature_index_.append(keys[key])
+            ensemble.estimators_.append(pipe.named_steps['clf'])
+        ensemble.classes_ = ensemble.estimators_[0].classes_
+        return ensemble
+
+    def transform(self, X):
+        """One feature matrix per distinct vectorizer configuration."""
+        return [vectorizer.transform(X) for vectorizer in self.vectorizers_]
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+
+        keys = {}
+        self.vectorizers_ = []
+        self.feature_index_ = []
+        features = []
+        for _, vectorizer, _ in self.estimators:
+            key = _vectorizer_key(vectorizer)
+            if key not in keys:
+                keys[key] = len(self.vectorizers_)
+                vectorizer = clone(vectorizer)
+                features.append(vectorizer.fit_transform(X))
+                self.vectorizers_.append(vectorizer)
+            self.feature_index_.append(keys[key])
+
+        self.estimators_ = [
+            clone(clf).fit(features[index], y)
+            for (_, _, clf), index in zip(self.estimators, self.feature_index_)
+        ]
+        return self
+
+    def predict_votes(self, features):
+        """Per-member class indices, shape (n_samples, n_estimators)."""
+        return np.column_stack([
+            np.searchsorted(self.classes_, clf.predict(features[index]))
+            for clf, index in zip(self.estimators_, self.feature_index_)
+        ])
+
+    def predict(self, X):
+        votes = self.predict_votes(self.transform(X))
+        counts = np.zeros((votes.shape[0], len(self.classes_)), dtype=np.int32)
+        rows = np.arange(votes.shape[0])
+        for column in votes.T:
+            counts[rows, column] += 1
+        # Majority vote; argmax breaks ties towards the lowest class index,
+        # the same as VotingClassifier
+        return self.classes_[counts.argmax(axis=1)]
+
+
+class PrefitStacking(ClassifierMixin, BaseEstimator):
+    """Stacking ensemble assembled from already fitted parts.
+
+    estimators      : list of (name, fitted classifier) used as base models
+    final_estimator : fitted classifier over the base models' meta-features
+
+    train_model.py fits the final estimator on out-of-fold meta-features
+    from its cross-validation fits, so unlike StackingClassifier nothing is
+    refitted to build the ensemble.
+    """
+
+    def __init__(self, estimators, final_estimator):
+        self.estimators = estimators
+        self.final_estimator = final_estimator
+
+    @property
+    def classes_(self):
+        return self.final_estimator.classes_
+
+    def transform(self, X):
+        return np.hstack([meta_features(clf, X) for _, clf in self.estimators])
+
+    def predict(self, X):
+        return self.final_estimator.predict(self.transform(X))
@@ -0,0 +1,89 @@
+"""
+On-disk, content-addressed cache of per-fold TF-IDF matrices.
+
+Cross-validation refits the vectorizer on every fold for every model, even
+though many models share a TF-IDF configuration and repeated training runs
+see the same rows. Each entry is keyed on the training data, the vectorizer
+parameters and the fold indices, so the cached matrices are valid for any
+classifier trained on that fold: repeated runs and classifier
+hyperparameter sweeps skip feature extraction entirely.
+
+Matrices are stored as uncompressed CSR component arrays (.npy) and loaded
+memory-mapped, so concurrent workers share the OS page cache instead of
+each holding a private copy.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+
+
+CSR_PARTS = ("data", "indices", "indptr")
+
+
+def data_digest(X):
+    """Digest of the training texts, in order."""
+    h = hashlib.sha256()
+    for text in X:
+        h.update(str(text).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _save_csr(directory, name, matrix):
+    matrix = sparse.csr_matrix(matrix)
+    for part in CSR_PARTS:
+        np.save(os.path.join(directory, f"{name}.{part}.npy"), getattr(matrix, part))
+    np.save(os.path.join(directory, f"{name}.shape.npy"), np.asarray(matrix.shape))
+
+
+def _load_csr(directory, name):
+    parts = [np.load(os.path.join(directory, f"{name}.{part}.npy"), mmap_mode="r")
+             for part in CSR_PARTS]
+    shape = tuple(np.load(os.path.join(directory, f"{name}.shape.npy")))
+    return sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
+
+
+class FeatureCache:
+    def __init__(self, root="model/feature_cache"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, digest, vectorizer, train_idx, val_idx):
+        h = hashlib.sha256()
+        h.update(digest.encode("ascii"))
+        h.update(repr(sorted(vectorizer.get_params().items())).encode("utf-8"))
+        h.update(np.asarray(train_idx, dtype=np.int64).tobytes())
+        h.update(b"|")
+        h.update(np.asarray(val_idx, dtype=np.int64).tobytes())
+        return h.hexdigest()
+
+    def fold_features(self, digest, vectorizer, X, train_idx, val_idx):
+        """(train matrix, validation matrix) for one fold, from cache if present."""
+        entry = os.path.join(self.root, self.key(digest, vectorizer, train_idx, val_idx))
+        if os.path.isdir(entry):
+            return _load_csr(entry, "train"), _load_csr(entry, "val")
+
+        vectorizer = clone(vectorizer)
+        train = vectorizer.fit_transform(X[train_idx])
+        val = vectorizer.transform(X[val_idx])
+
+        # Write to a scratch directory and rename it into place, so readers
+        # never see a partial entry; if another worker won the race, keep its copy.
+        scratch = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        try:
+            _save_csr(scratch, "train", train)
+            _save_csr(scratch, "val", val)
+            os.rename(scratch, entry)
+        except OSError:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        return train, val
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
@@ -0,0 +1,166 @@
+"""
+Micro-batching inference for the complaint classifier.
+
+Concurrent callers (Streamlit sessions, API workers) submit texts to one
+BatchPredictor; a background thread gathers the waiting requests into a
+single model.predict() call. The ensemble's TF-IDF transforms and tree
+traversals are vectorized, so one predict over N texts costs far less than
+N single-text predicts.
+
+The worker only waits (up to `max_wait_ms`) for more requests while the
+previous batch shows other callers are active, so a lone caller is served
+right away.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import metrics
+
+
+def _bucket(size):
+    """Power-of-two histogram bucket for a batch size (1, 2, 4, 8, ...)."""
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return bucket
+
+
+class BatchPredictor:
+    """Thread-safe, micro-batching wrapper around a scikit-learn classifier.
+
+    Exposes predict(texts) like the wrapped model, so it can be passed to
+    utils.enrich() as the classifier.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._max_pending = 0
+        self._batches = 0
+        self._predicted = 0
+        self._histogram = Counter()
+        # Requests in the previous batch: how many callers to expect
+        self._last_requests = 1
+
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="batch-predictor", daemon=True)
+        self._worker.start()
+
+    # --------------------------------------------------
+    # PUBLIC API
+    # --------------------------------------------------
+    def submit(self, texts):
+        """Queue texts for prediction and return a Future of their labels."""
+        if self._closed:
+            raise RuntimeError("BatchPredictor is closed")
+
+        texts = list(texts)
+        future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+
+        with self._lock:
+            self._pending += len(texts)
+            self._max_pending = max(self._max_pending, self._pending)
+        self._queue.put((texts, future))
+        return future
+
+    @metrics.timed("model.predict")
+    def predict(self, texts, timeout=None):
+        """Predict labels for texts, batched with other concurrent callers."""
+        return self.submit(texts).result(timeout)
+
+    def stats(self):
+        """Queue depth and batch-size histogram since startup."""
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "max_queue_depth": self._max_pending,
+                "batches": self._batches,
+                "predicted": self._predicted,
+                "avg_batch_size": self._predicted / self._batches if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._histogram.items())),
+            }
+
+    def close(self):
+        """Stop the worker after the queued requests are served."""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    # --------------------------------------------------
+    # WORKER
+    # --------------------------------------------------
+    def _collect(self, first):
+        """Gather requests until the batch is full.
+
+        Requests already queued are always taken. Beyond that the worker
+        waits, for at most max_wait, only until the batch has as many
+        requests as the previous one, so it does not wait at all for a
+        lone caller.
+        """
+        requests = [first]
+        size = len(first[0])
+        expected = self._last_requests
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                if len(requests) < expected:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown marker: serve this batch, then let _run exit
+                self._queue.put(None)
+                break
+            requests.append(item)
+            size += len(item[0])
+
+        self._last_requests = len(requests)
+        return requests, size
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            requests, size = self._collect(first)
+            batch = [text for texts, _ in requests for text in texts]
+
+            try:
+                with metrics.timer("model.predict_batch"):
+                    labels = list(self.model.predict(batch))
+                error = None
+            except Exception as e:
+                error = e
+
+            metrics.increment("model.predicted", size)
+            with self._lock:
+                self._pending -= size
+                self._batches += 1
+                self._predicted += size
+                self._histogram[_bucket(size)] += 1
+
+            offset = 0
+            for texts, future in requests:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(labels[offset:offset + len(texts)])
+                offset += len(texts)
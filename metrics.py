@@ -0,0 +1,248 @@
+"""
+In-process instrumentation: latency histograms, error counts and counters
+for the hot paths (model inference, SQLite calls, sentiment scoring, PDF
+rendering, API requests).
+
+    @metrics.timed("db.add_complaint")
+    def add_complaint(self, complaint): ...
+
+    with metrics.timer("model.predict_batch"):
+        labels = model.predict(batch)
+
+    metrics.increment("statistics.cache_hit")
+
+An exception escaping a timed block is recorded as an error of that
+operation and re-raised. Recording is on unless GRIEVANCE_METRICS=0 is set
+(or disable() is called); when off, timed() and timer() cost a flag check.
+
+Every process keeps its own registry. The API serves it at /metrics, the
+Streamlit admin panel shows it, and write_prometheus() dumps it to a file,
+all in the Prometheus text format.
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+
+METRIC_PREFIX = "grievance"
+
+# Histogram bucket upper bounds in seconds; a final +Inf bucket is implied
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get("GRIEVANCE_METRICS", "1") != "0"
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+_NULL_TIMER = nullcontext()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class Histogram:
+    """Latency distribution and error count of one operation."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """Estimated q-quantile in seconds, interpolated within its bucket
+        the way Prometheus' histogram_quantile() does."""
+        with self._lock:
+            buckets, count = list(self.buckets), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(buckets):
+            if n and seen + n >= rank:
+                if i == len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[-1]
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                return lower + (LATENCY_BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return LATENCY_BUCKETS[-1]
+
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+# --------------------------------------------------
+# RECORDING
+# --------------------------------------------------
+def observe(name, seconds, error=False):
+    """Record one call of operation `name` that took `seconds`."""
+    if _enabled:
+        _histogram(name).observe(seconds, error)
+
+
+def increment(name, value=1):
+    """Add `value` to counter `name`."""
+    if _enabled:
+        with _registry_lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def timer(name):
+    """Context manager timing the block as one call of operation `name`."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(_histogram(name))
+
+
+def timed(name):
+    """Decorator timing every call of the function as operation `name`."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                _histogram(name).observe(time.perf_counter() - start, True)
+                raise
+            _histogram(name).observe(time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorate
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# --------------------------------------------------
+# REPORTING
+# --------------------------------------------------
+def snapshot():
+    """Summary of every operation and counter, for display.
+
+    {"operations": {name: {"calls", "errors", "total_s", "mean_ms",
+                           "p50_ms", "p95_ms", "p99_ms"}},
+     "counters": {name: value}}
+    """
+    with _registry_lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+
+    operations = {}
+    for name in sorted(histograms):
+        h = histograms[name]
+        operations[name] = {
+            "calls": h.count,
+            "errors": h.errors,
+            "total_s": h.total,
+            "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+            "p50_ms": h.quantile(0.50) * 1000,
+            "p95_ms": h.quantile(0.95) * 1000,
+            "p99_ms": h.quantile(0.99) * 1000,
+        }
+    return {"operations": operations, "counters": dict(sorted(counters.items()))}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text():
+    """The registry in the Prometheus text exposition format (0.0.4)."""
+    with _registry_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    duration = f"{METRIC_PREFIX}_operation_duration_seconds"
+    errors = f"{METRIC_PREFIX}_operation_errors_total"
+    events = f"{METRIC_PREFIX}_events_total"
+
+    lines = [f"# HELP {duration} Latency of instrumented operations.",
+             f"# TYPE {duration} histogram"]
+    error_lines = [f"# HELP {errors} Instrumented operations that raised.",
+                   f"# TYPE {errors} counter"]
+    for name, h in histograms:
+        with h._lock:
+            buckets, count, total, failed = list(h.buckets), h.count, h.total, h.errors
+        label = f'operation="{_label(name)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += n
+            lines.append(f'{duration}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f"{duration}_sum{{{label}}} {total:.6f}")
+        lines.append(f"{duration}_count{{{label}}} {count}")
+        error_lines.append(f"{errors}{{{label}}} {failed}")
+
+    lines += error_lines
+    lines += [f"# HELP {events} Event counters.", f"# TYPE {events} counter"]
+    lines += [f'{events}{{event="{_label(name)}"}} {value}' for name, value in counters]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically write prometheus_text() to `path` (e.g. for the node
+    exporter's textfile collector)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".prom")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_text())
+        # mkstemp creates 0600; collectors often run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,177 @@
+"""
+Incremental retraining from complaints filed in the database.
+
+OnlineComplaintClassifier uses stateless hashing features and an
+SGDClassifier, so it can be updated with partial_fit on new rows without
+revisiting old ones. update_from_database() streams complaints added since
+the last update out of SQLite and updates the model. It replaces the
+deployed model/classifier.pkl (and model_metadata.json) only when it scores
+at least as well as that model on the held-out test split of the CSV
+dataset; otherwise only the online state is saved.
+
+Run it with:  python train_model.py --incremental
+"""
+import json
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+
+from database import GrievanceDatabase
+from training import publish_model
+from compact_model import export_compact, load_classifier
+
+
+ONLINE_MODEL_PATH = "model/online_model.pkl"
+ONLINE_MODEL_NAME = "Online SGD (hashing features)"
+
+# Same held-out split as train_model.py, so both models face the same test set
+TEST_SIZE = 0.20
+SPLIT_SEED = 42
+
+
+class OnlineComplaintClassifier(ClassifierMixin, BaseEstimator):
+    """Hashing features + SGD, trainable in chunks with partial_fit."""
+
+    def __init__(self, n_features=2 ** 20, ngram_range=(1, 2), alpha=1e-5):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+
+    def _vectorizer(self):
+        return HashingVectorizer(
+            n_features=self.n_features,
+            ngram_range=self.ngram_range,
+            stop_words='english',
+            alternate_sign=False,
+            norm='l2'
+        )
+
+    def partial_fit(self, X, y, classes=None):
+        if not hasattr(self, "classifier_"):
+            self.vectorizer_ = self._vectorizer()
+            self.classifier_ = SGDClassifier(
+                loss='modified_huber', alpha=self.alpha, random_state=42
+            )
+            self.samples_seen_ = 0
+            self.last_complaint_id_ = 0
+        self.classifier_.partial_fit(self.vectorizer_.transform(X), y, classes=classes)
+        self.samples_seen_ += len(y)
+        return self
+
+    @property
+    def classes_(self):
+        return self.classifier_.classes_
+
+    def predict(self, X):
+        return self.classifier_.predict(self.vectorizer_.transform(X))
+
+
+def _split(csv_path):
+    """(train, test) frames of the labelled CSV dataset."""
+    data = pd.read_csv(csv_path)
+    return train_test_split(data, test_size=TEST_SIZE, random_state=SPLIT_SEED,
+                            stratify=data["category"])
+
+
+def _accuracy(model, test):
+    return float(np.mean(model.predict(test["complaint_text"].tolist()) == test["category"].values))
+
+
+def _bootstrap(data, chunk_size, epochs=5):
+    """Fresh online model trained on labelled complaints."""
+    classes = np.unique(data["category"])
+    model = OnlineComplaintClassifier()
+    for epoch in range(epochs):
+        shuffled = data.sample(frac=1.0, random_state=epoch)
+        for start in range(0, len(shuffled), chunk_size):
+            chunk = shuffled.iloc[start:start + chunk_size]
+            model.partial_fit(chunk["complaint_text"], chunk["category"], classes=classes)
+    model.samples_seen_ = len(data)
+    return model
+
+
+def update_from_database(db=None, model_path=ONLINE_MODEL_PATH,
+                         csv_path="data/cleaned_data.csv", chunk_size=1000,
+                         classifier_path="model/classifier.pkl",
+                         metadata_path="model/model_metadata.json"):
+    """Train the online model on complaints added since its last update.
+
+    The complaint `category` column is used as the label. Rows whose category
+    is not one of the model's classes are skipped. The online model is
+    published over `classifier_path` only if its test accuracy is not below
+    the deployed model's. Returns a summary dict.
+    """
+    db = db or GrievanceDatabase()
+    train, test = _split(csv_path)
+
+    bootstrapped = not os.path.exists(model_path)
+    if not bootstrapped:
+        model = joblib.load(model_path)
+    else:
+        print(f"   No online model at {model_path}, bootstrapping from {csv_path}")
+        model = _bootstrap(train, chunk_size)
+
+    known = set(model.classes_)
+    added = skipped = 0
+    for rows in db.iter_complaints(after_id=model.last_complaint_id_, chunk_size=chunk_size):
+        labelled = [r for r in rows if r["category"] in known]
+        skipped += len(rows) - len(labelled)
+        if labelled:
+            model.partial_fit([r["complaint_text"] for r in labelled],
+                              [r["category"] for r in labelled])
+            added += len(labelled)
+        model.last_complaint_id_ = rows[-1]["id"]
+
+    summary = {
+        'last_complaint_id': int(model.last_complaint_id_),
+        'rows_added': added,
+        'rows_skipped': skipped,
+        'published': False,
+    }
+    if not added and not bootstrapped:
+        return summary
+
+    # The state file is written first so training is kept even when the
+    # model is not published (or publishing fails)
+    joblib.dump(model, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+
+    accuracy = _accuracy(model, test)
+    deployed = load_classifier(classifier_path)
+    deployed_accuracy = _accuracy(deployed, test) if deployed is not None else None
+    summary['accuracy'] = accuracy
+    summary['deployed_accuracy'] = deployed_accuracy
+    if deployed_accuracy is not None and accuracy < deployed_accuracy:
+        return summary
+
+    all_models = {ONLINE_MODEL_NAME: {'test_accuracy': accuracy}}
+    if deployed is not None:
+        previous = "Previously deployed model"
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                previous = json.load(f).get('model_name', previous)
+        all_models.setdefault(previous, {'test_accuracy': deployed_accuracy})
+
+    metadata = {
+        'model_name': ONLINE_MODEL_NAME,
+        'accuracy': accuracy,
+        'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'training_samples': int(model.samples_seen_),
+        'test_samples': len(test),
+        'categories': [str(c) for c in model.classes_],
+        'all_models': all_models,
+        'feature_extraction': f'HashingVectorizer ({model.n_features} features)',
+        'incremental': {k: summary[k] for k in ('last_complaint_id', 'rows_added', 'rows_skipped')},
+    }
+    publish_model(model, metadata, model_path=classifier_path, metadata_path=metadata_path)
+    export_compact(model)
+    summary['published'] = True
+
+    return summary
@@ -1,20 +1,33 @@
+import hashlib
+import io
+import json
 import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
-def generate_pdf_report(ticket_id: str, data: dict):
+import metrics
+
+
+RECEIPT_DIR = "reports"
+
+# Bump when the receipt layout changes so cached PDFs are re-rendered
+RECEIPT_LAYOUT_VERSION = 1
+
+
+@metrics.timed("pdf.render")
+def render_receipt(ticket_id: str, data: dict, output):
     """
     ticket_id : str
     data      : dict (complaint details)
-    return    : file path of generated PDF
+    output    : file path or binary file object the PDF is written to
     """
-
-    # Create reports folder if not exists
-    os.makedirs("reports", exist_ok=True)
-
-    file_path = f"reports/Grievance_{ticket_id}.pdf"
-
-    c = canvas.Canvas(file_path, pagesize=A4)
+    c = canvas.Canvas(output, pagesize=A4)
     width, height = A4
 
     y = height - 50
@@ -55,4 +68,154 @@ def generate_pdf_report(ticket_id: str, data: dict):
     )
 
     c.save()
+
+
+def render_receipt_bytes(ticket_id: str, data: dict):
+    """Render the receipt into an in-memory buffer and return the PDF bytes."""
+    buffer = io.BytesIO()
+    render_receipt(ticket_id, data, buffer)
+    return buffer.getvalue()
+
+
+def generate_pdf_report(ticket_id: str, data: dict):
+    """
+    ticket_id : str
+    data      : dict (complaint details)
+    return    : file path of generated PDF
+    """
+
+    # Create reports folder if not exists
+    os.makedirs(RECEIPT_DIR, exist_ok=True)
+
+    file_path = f"{RECEIPT_DIR}/Grievance_{ticket_id}.pdf"
+    render_receipt(ticket_id, data, file_path)
     return file_path
+
+
+def receipt_fields(complaint: dict):
+    """Receipt fields for a complaint record as stored in the database."""
+    return {
+        "Name": complaint["name"],
+        "Email": complaint["email"],
+        "Phone": complaint["phone"] or "N/A",
+        "Category": complaint["category"],
+        "Priority": complaint["priority"],
+        "Department": complaint["department"],
+        "Sentiment": complaint["sentiment_label"],
+        "Keywords": complaint["keywords"],
+        "Estimated Resolution": complaint["resolution_time"],
+        "Status": complaint["status"],
+        "Submitted At": complaint["submitted_at"],
+        "Complaint": complaint["complaint_text"]
+    }
+
+
+# ================= BACKGROUND RENDERING =================
+def receipt_digest(ticket_id: str, data: dict):
+    """Content address of a receipt: changes whenever any field does."""
+    payload = json.dumps([RECEIPT_LAYOUT_VERSION, ticket_id, data], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _prune_receipts(directory, ticket_id, keep):
+    """Delete the ticket's receipts for older contents, keeping `keep`."""
+    prefix = f"Grievance_{ticket_id}-"
+    for entry in os.scandir(directory):
+        name = entry.name
+        if (name.startswith(prefix) and name.endswith(".pdf") and name != keep
+                and len(name) == len(prefix) + 16 + len(".pdf")):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _render_to_directory(directory, ticket_id, data, digest):
+    """Render into `directory` unless this exact receipt is already there.
+    Receipts of the same ticket with older contents are removed."""
+    file_name = f"Grievance_{ticket_id}-{digest[:16]}.pdf"
+    file_path = os.path.join(directory, file_name)
+    if os.path.exists(file_path):
+        return file_path
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            render_receipt(ticket_id, data, f)
+        # mkstemp creates 0600; receipts may be served by another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune_receipts(directory, ticket_id, file_name)
+    return file_path
+
+
+def _render_in_memory(directory, ticket_id, data, digest):
+    return render_receipt_bytes(ticket_id, data)
+
+
+class ReceiptRenderer:
+    """Renders receipts on a worker pool, off the request path.
+
+    directory   : where PDFs are cached, named by ticket and content digest;
+                  None renders into memory and Futures resolve to bytes
+    max_workers : pool size
+    processes   : use a process pool instead of threads
+    cache_size  : recent receipts whose Futures are kept for reuse
+
+    submit() returns a Future of the PDF path (or bytes). Identical requests,
+    in flight or recently completed, share one Future, so a receipt is only
+    rendered again when one of its fields changes. Only the newest receipt
+    of each ticket is kept on disk.
+    """
+
+    def __init__(self, directory=RECEIPT_DIR, max_workers=2, processes=False, cache_size=256):
+        self.directory = directory
+        self.cache_size = cache_size
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._executor = pool(max_workers=max_workers)
+        self._render = _render_to_directory if directory else _render_in_memory
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, ticket_id: str, data: dict) -> Future:
+        digest = receipt_digest(ticket_id, data)
+        with self._lock:
+            future = self._futures.get(digest)
+            if future is not None and self._still_on_disk(future):
+                self._futures.move_to_end(digest)
+                metrics.increment("pdf.receipt_reused")
+                return future
+
+            future = self._executor.submit(self._render, self.directory, ticket_id, dict(data), digest)
+            self._futures[digest] = future
+            if len(self._futures) > self.cache_size:
+                self._futures.popitem(last=False)
+
+        future.add_done_callback(partial(self._forget_if_failed, digest))
+        return future
+
+    def _still_on_disk(self, future):
+        """False if a finished receipt's file was pruned since (the ticket
+        changed and then changed back)."""
+        if not self.directory or not future.done() or future.exception() is not None:
+            return True
+        return os.path.exists(future.result())
+
+    def render(self, ticket_id: str, data: dict, timeout=None):
+        """Submit and wait for the receipt."""
+        return self.submit(ticket_id, data).result(timeout)
+
+    def _forget_if_failed(self, digest, future):
+        """Drop a failed render so the next request retries it."""
+        if future.cancelled() or future.exception() is None:
+            return
+        with self._lock:
+            if self._futures.get(digest) is future:
+                del self._futures[digest]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
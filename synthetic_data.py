@@ -0,0 +1,141 @@
+"""
+Synthetic complaints for benchmarks and load tests.
+
+Texts are variations of the labelled complaints in data/cleaned_data.csv:
+numbers are redrawn, and opening phrases, locations, durations, urgency and
+a second sentence from another complaint of the same category are mixed in.
+Every generator is lazy and fully determined by its seed, so any count (up
+to millions) can be streamed without holding it in memory, and the same
+seed always produces the same data.
+
+    for text, category in synthetic_texts(1000000):
+        ...
+    db.add_complaints_bulk(synthetic_complaints(100000))
+"""
+import random
+import re
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils import (
+    _keywords_from_lower, _match_priority_lower, complaint_record,
+    estimate_resolution_time, get_department,
+)
+
+
+SEED_CSV = "data/cleaned_data.csv"
+
+OPENINGS = (
+    "", "Respected Sir/Madam, ", "Kindly note that ", "I want to report that ",
+    "This is to inform you that ", "Residents are complaining that ", "Once again, ",
+)
+LANDMARKS = (
+    "the bus stand", "the main market", "the government school", "the railway crossing",
+    "the primary health centre", "the post office", "the temple road", "the water tank",
+    "the community hall", "the police station", "the district court", "the old bridge",
+    "the park", "the panchayat office", "the petrol pump", "the hospital gate",
+)
+AREAS = (
+    "Sector {n}", "Ward {n}", "Block {n}", "Phase {n}", "Gandhi Nagar", "Nehru Colony",
+    "Shanti Vihar", "Rajiv Chowk", "Civil Lines", "Model Town", "Indira Colony",
+    "Ambedkar Nagar", "Subhash Marg", "Patel Nagar", "Azad Basti", "Laxmi Puram",
+)
+DURATIONS = (
+    "The problem has continued for {n} days.", "This has been going on for {n} weeks.",
+    "We complained {n} times already with no response.", "It started {n} days ago.",
+)
+CLOSINGS = (
+    "Please resolve this urgently.", "Immediate action is requested.",
+    "Kindly look into this at the earliest.", "Please send someone to inspect.",
+    "We request the department to act quickly.", "Thank you.",
+)
+FIRST_NAMES = (
+    "Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Rohan", "Priya",
+    "Arjun", "Meera", "Sanjay", "Fatima", "Imran", "Gurpreet", "Lakshmi", "Joseph", "Neha",
+)
+LAST_NAMES = (
+    "Sharma", "Verma", "Iyer", "Reddy", "Khan", "Singh", "Das", "Patel", "Nair",
+    "Gupta", "Mehta", "Fernandes", "Banerjee", "Yadav", "Kulkarni", "Joshi",
+)
+STATUSES = (("Pending", 0.5), ("In Progress", 0.3), ("Resolved", 0.2))
+SENTIMENTS = (("Negative", -0.55), ("Neutral", 0.0), ("Positive", 0.35))
+
+_NUMBER = re.compile(r"\d+")
+
+
+def load_seed_complaints(path=SEED_CSV):
+    """(text, category) pairs the synthetic texts are derived from."""
+    data = pd.read_csv(path).dropna(subset=["complaint_text", "category"])
+    return list(zip(data["complaint_text"].astype(str), data["category"].astype(str)))
+
+
+def _vary(rng, text, extra):
+    """One variation of a seed complaint text."""
+    text = _NUMBER.sub(lambda m: str(rng.randint(1, 99 if len(m.group()) < 3 else 999)), text)
+    opening = rng.choice(OPENINGS)
+    if opening:
+        text = opening + text[0].lower() + text[1:]
+    parts = [text]
+    if rng.random() < 0.7:
+        area = rng.choice(AREAS).format(n=rng.randint(1, 60))
+        parts.append(f"This is near {rng.choice(LANDMARKS)}, {area}.")
+    if rng.random() < 0.25:
+        parts.append(extra)
+    if rng.random() < 0.4:
+        parts.append(rng.choice(DURATIONS).format(n=rng.randint(2, 30)))
+    if rng.random() < 0.4:
+        parts.append(rng.choice(CLOSINGS))
+    return " ".join(parts)
+
+
+def synthetic_texts(count, seed=42, path=SEED_CSV):
+    """Yield `count` (text, category) pairs."""
+    rng = random.Random(seed)
+    seeds = load_seed_complaints(path)
+    by_category = {}
+    for text, category in seeds:
+        by_category.setdefault(category, []).append(text)
+
+    for _ in range(count):
+        text, category = rng.choice(seeds)
+        yield _vary(rng, text, rng.choice(by_category[category])), category
+
+
+def synthetic_complaints(count, seed=42, path=SEED_CSV, days=365, end=None):
+    """Yield `count` complaints-table rows, oldest first, spread evenly over
+    the `days` before `end` (default: now).
+
+    Priority, department, keywords and resolution time come from the real
+    analyzers. The category is the seed complaint's label and sentiment is
+    drawn at random, so no model or lexicon is needed to generate millions
+    of rows. Ticket IDs have the usual shape and are unique per row index.
+    """
+    rng = random.Random(seed + 1)
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    statuses, status_weights = zip(*STATUSES)
+
+    for i, (text, category) in enumerate(synthetic_texts(count, seed, path)):
+        submitted = start + timedelta(seconds=i * step)
+        lowered = text.lower()
+        priority, _ = _match_priority_lower(lowered)
+        label, score = rng.choice(SENTIMENTS)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+        analysis = {
+            "ticket_id": f"GRV-{submitted:%Y%m%d%H%M%S}{submitted.microsecond // 1000:03d}-{i:08d}",
+            "category": category,
+            "priority": priority,
+            "department": get_department(category),
+            "sentiment": {"label": label, "score": round(score + rng.uniform(-0.3, 0.3), 4)},
+            "keywords": _keywords_from_lower(lowered),
+            "resolution_time": estimate_resolution_time(category, priority),
+        }
+        record = complaint_record(
+            analysis, f"{first} {last}", f"{first}.{last}{i}@example.com".lower(), text,
+            phone=f"9{rng.randrange(10 ** 9):09d}", submitted_at=f"{submitted:%Y-%m-%d %H:%M:%S}"
+        )
+        record["status"] = rng.choices(statuses, status_weights)[0]
+        yield record
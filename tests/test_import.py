@@ -0,0 +1,19 @@
+"""`import utils` stays cheap: no NLTK at import and within IMPORT_BUDGET_MS."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import IMPORT_BUDGET_MS, measure_import_ms  # noqa: E402
+
+
+def test_import_utils_does_not_load_nltk():
+    _, nltk_loaded = measure_import_ms("utils")
+    assert not nltk_loaded
+
+
+def test_import_utils_within_budget():
+    # Best of three, as the benchmark stage measures it, so one slow
+    # interpreter start on a busy machine does not fail the run.
+    elapsed = min(measure_import_ms("utils")[0] for _ in range(3))
+    assert elapsed <= IMPORT_BUDGET_MS, f"import utils took {elapsed:.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
@@ -1,19 +1,52 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, VotingClassifier, StackingClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, VotingClassifier
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import LinearSVC
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, accuracy_score
-import joblib
-import json
+from ensemble import SharedTfidfVoting, PrefitStacking
+from training import train_models, timed_stage, publish_model
+from feature_cache import FeatureCache
+from compact_model import export_compact, load_compact, COMPACT_MODEL_DIR
+import argparse
+import sys
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(description="Train the grievance classifier")
+parser.add_argument("--jobs", type=int, default=-1,
+                    help="parallel worker processes for model/fold fits (-1 = all cores)")
+parser.add_argument("--feature-cache", default="model/feature_cache",
+                    help="directory for cached per-fold TF-IDF matrices")
+parser.add_argument("--no-feature-cache", action="store_true",
+                    help="vectorize every fold from scratch")
+parser.add_argument("--incremental", action="store_true",
+                    help="update the online model with new complaints from the database")
+args = parser.parse_args()
+
+if args.incremental:
+    from online_model import update_from_database
+    print("Incremental update from data/grievances.db...")
+    summary = update_from_database()
+    print(f"   ✓ Added {summary['rows_added']} complaints "
+          f"(skipped {summary['rows_skipped']}, last id {summary['last_complaint_id']})")
+    if summary['published']:
+        print(f"   ✓ Model saved: model/classifier.pkl (test accuracy {summary['accuracy']:.4f})")
+    elif 'accuracy' in summary:
+        print(f"   ✗ Not published: test accuracy {summary['accuracy']:.4f} is below "
+              f"the deployed model's {summary['deployed_accuracy']:.4f}")
+    sys.exit(0)
+
+N_JOBS = args.jobs
+feature_cache = None if args.no_feature_cache else FeatureCache(args.feature_cache)
+
+stage_timings = {}
+
 print("="*60)
 print("AI Grievance Classification - Ultra-Optimized Training")
 print("="*60)
@@ -52,6 +85,10 @@ tfidf_ultra = {
 }
 print("   ✓ TF-IDF parameters optimized (30K features, 1-4 grams)\n")
 
+# Voting ensemble shares one TF-IDF matrix per distinct vectorizer config
+# instead of re-vectorizing every complaint once per member
+SHARED_FEATURE_ENSEMBLE = True
+
 # Ultra-optimized model configurations
 print("[4/9] Initializing ultra-optimized models...")
 models = {
@@ -115,36 +152,38 @@ best_score = 0
 best_model_name = ""
 model_results = {}
 
-print("[5/9] Training with 15-fold cross-validation...")
+print(f"[5/9] Training with 15-fold cross-validation ({N_JOBS} parallel jobs)...")
 skf = StratifiedKFold(n_splits=15, shuffle=True, random_state=42)
 
-for name, model in models.items():
-    print(f"\n   Training {name}...")
-    try:
-        model.fit(X_train, y_train)
-        
-        # Extended cross-validation
-        cv_scores = cross_val_score(model, X_train, y_train, cv=skf, scoring='accuracy')
-        
-        # Test predictions
-        y_pred = model.predict(X_test)
-        test_accuracy = accuracy_score(y_test, y_pred)
-        
-        print(f"   ✓ CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
-        print(f"   ✓ Test Accuracy: {test_accuracy:.4f}")
-        
-        model_results[name] = {
-            'cv_mean': float(cv_scores.mean()),
-            'cv_std': float(cv_scores.std()),
-            'test_accuracy': float(test_accuracy)
-        }
-        
-        if test_accuracy > best_score:
-            best_score = test_accuracy
-            best_model = model
-            best_model_name = name
-    except Exception as e:
-        print(f"   ✗ Error: {str(e)}")
+with timed_stage("models_and_cv", stage_timings):
+    trained = train_models(models, X_train, y_train, skf, n_jobs=N_JOBS, cache=feature_cache)
+
+for name, result in trained.items():
+    print(f"\n   {name}")
+    if result["error"]:
+        print(f"   ✗ Error: {result['error']}")
+        continue
+
+    model = result["model"]
+    cv_scores = result["cv_scores"]
+
+    # Test predictions
+    y_pred = model.predict(X_test)
+    test_accuracy = accuracy_score(y_test, y_pred)
+
+    print(f"   ✓ CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+    print(f"   ✓ Test Accuracy: {test_accuracy:.4f}")
+
+    model_results[name] = {
+        'cv_mean': float(cv_scores.mean()),
+        'cv_std': float(cv_scores.std()),
+        'test_accuracy': float(test_accuracy)
+    }
+
+    if test_accuracy > best_score:
+        best_score = test_accuracy
+        best_model = model
+        best_model_name = name
 
 print(f"\n[6/9] Best Individual Model: {best_model_name}")
 print(f"      Accuracy: {best_score*100:.2f}%")
@@ -156,24 +195,33 @@ print(f"   ✓ Top 4 models for stacking:")
 for model_name, results in top_models:
     print(f"      - {model_name}: {results['test_accuracy']*100:.2f}%")
 
-estimators = [(name, models[name]) for name, _ in top_models]
+# Ensembles reuse the fits from step 5 instead of refitting every member
+estimators = [(name, trained[name]["model"]) for name, _ in top_models]
 
 # Try voting classifier first
-voting_clf = VotingClassifier(estimators=estimators, voting='hard')
 print(f"\n   Training voting ensemble...")
-voting_clf.fit(X_train, y_train)
-voting_score = voting_clf.score(X_test, y_test)
+with timed_stage("voting_ensemble", stage_timings):
+    if SHARED_FEATURE_ENSEMBLE:
+        voting_clf = SharedTfidfVoting.from_fitted_pipelines(estimators)
+    else:
+        voting_clf = VotingClassifier(
+            estimators=[(name, models[name]) for name, _ in top_models], voting='hard'
+        )
+        voting_clf.fit(X_train, y_train)
+    voting_score = voting_clf.score(X_test, y_test)
+if SHARED_FEATURE_ENSEMBLE:
+    print(f"   ✓ {len(estimators)} members share {len(voting_clf.vectorizers_)} TF-IDF feature sets")
 print(f"   ✓ Voting Ensemble Accuracy: {voting_score:.4f}")
 
-# Try stacking classifier
-stacking_clf = StackingClassifier(
-    estimators=estimators,
-    final_estimator=LogisticRegression(max_iter=5000, C=5.0, random_state=42),
-    cv=10
-)
+# Try stacking classifier: the final estimator learns from the out-of-fold
+# predictions the cross-validation fits already produced
 print(f"\n   Training stacking ensemble...")
-stacking_clf.fit(X_train, y_train)
-stacking_score = stacking_clf.score(X_test, y_test)
+with timed_stage("stacking_ensemble", stage_timings):
+    oof_features = np.hstack([trained[name]["oof"] for name, _ in top_models])
+    final_estimator = LogisticRegression(max_iter=5000, C=5.0, random_state=42)
+    final_estimator.fit(oof_features, y_train)
+    stacking_clf = PrefitStacking(estimators, final_estimator)
+    stacking_score = stacking_clf.score(X_test, y_test)
 print(f"   ✓ Stacking Ensemble Accuracy: {stacking_score:.4f}")
 
 # Select best ensemble
@@ -209,8 +257,6 @@ print(classification_report(y_test, y_pred))
 
 # Save model and metadata
 print("\nSaving final model...")
-joblib.dump(final_model, "model/classifier.pkl")
-
 metadata = {
     'model_name': final_model_name,
     'accuracy': float(final_score),
@@ -229,15 +275,28 @@ metadata = {
         'max_df': 0.85
     },
     'cv_strategy': 'StratifiedKFold-15',
-    'optimization_level': 'Ultra'
+    'stacking_strategy': 'Out-of-fold predictions from the CV fits',
+    'optimization_level': 'Ultra',
+    'stage_timings_sec': stage_timings
 }
 
-with open('model/model_metadata.json', 'w') as f:
-    json.dump(metadata, f, indent=4)
+publish_model(final_model, metadata)
 
 print(f"   ✓ Model saved: model/classifier.pkl")
 print(f"   ✓ Metadata saved: model/model_metadata.json")
 
+# Compact, memory-mappable copy for fast worker cold starts
+try:
+    export_compact(final_model, COMPACT_MODEL_DIR)
+    agreement = (load_compact(COMPACT_MODEL_DIR).predict(X_test) == final_model.predict(X_test)).mean()
+    print(f"   ✓ Compact model saved: {COMPACT_MODEL_DIR} ({agreement*100:.1f}% agreement on test set)")
+except ValueError as e:
+    print(f"   ✗ Compact export skipped: {e}")
+
+print("\n   Stage timings:")
+for stage, seconds in stage_timings.items():
+    print(f"      {stage:<20} {seconds:>8.2f}s")
+
 print("\n" + "="*60)
 print("✅ Ultra-Optimized Training Completed!")
 print(f"   Final Model: {final_model_name}")
@@ -0,0 +1,161 @@
+"""
+Parallel training driver for train_model.py.
+
+Every (model, CV fold) fit and every full-training-set fit is an independent
+task spread over a joblib process pool. Each model is fitted exactly once
+per fold and once on the full training set:
+
+- the fold fits give the cross-validation scores and, from the same fitted
+  estimators, the out-of-fold meta-features for the stacking ensemble;
+- the full fits are the individual models, the voting members and the
+  stacking base estimators.
+"""
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import joblib
+from joblib import Parallel, delayed
+from sklearn.base import clone
+
+from feature_cache import data_digest
+
+
+STACK_METHODS = ("predict_proba", "decision_function", "predict")
+
+
+@contextmanager
+def timed_stage(label, timings):
+    """Record the wall time of a block in `timings[label]` and print it."""
+    start = time.perf_counter()
+    yield
+    timings[label] = round(time.perf_counter() - start, 3)
+    print(f"   ⏱ {label}: {timings[label]:.2f}s")
+
+
+def stack_method(clf):
+    """Same choice as StackingClassifier(stack_method='auto')."""
+    for method in STACK_METHODS:
+        if hasattr(clf, method):
+            return method
+
+
+def meta_features(clf, X):
+    """Stacking input for one fitted classifier, one column per class."""
+    method = stack_method(clf)
+    output = getattr(clf, method)(X)
+    if method == "predict":
+        output = np.searchsorted(clf.classes_, output)
+    return output.reshape(len(output), -1)
+
+
+def fit_fold(pipeline, X, y, train_idx, val_idx, cache=None, digest=None):
+    """Fit a clone on one fold; return (val accuracy, val meta-features).
+
+    With a FeatureCache the fold's TF-IDF matrices come from (or go to) the
+    cache and only the classifier step is fitted here.
+    """
+    if cache is None:
+        model = clone(pipeline).fit(X[train_idx], y[train_idx])
+        val_X = X[val_idx]
+    else:
+        train_X, val_X = cache.fold_features(
+            digest, pipeline.named_steps['tfidf'], X, train_idx, val_idx
+        )
+        model = clone(pipeline.named_steps['clf']).fit(train_X, y[train_idx])
+
+    accuracy = float(np.mean(model.predict(val_X) == y[val_idx]))
+    return accuracy, meta_features(model, val_X)
+
+
+def fit_full(pipeline, X, y):
+    return clone(pipeline).fit(X, y)
+
+
+def _run_task(func, *args):
+    """Run a task in a worker, returning (result, error message)."""
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, str(e)
+
+
+def train_models(models, X, y, cv, n_jobs=-1, cache=None):
+    """Cross-validate and fully fit every model in one parallel pass.
+
+    Pass a feature_cache.FeatureCache to reuse per-fold TF-IDF matrices
+    across models, runs and sweeps.
+
+    Returns {name: {"model", "cv_scores", "oof", "error"}} where "oof" holds
+    the out-of-fold meta-features for every training row and "error" is set
+    (and the rest missing) if any fit of that model failed.
+    """
+    X = np.asarray(X, dtype=object)
+    y = np.asarray(y)
+    folds = list(cv.split(X, y))
+    digest = data_digest(X) if cache is not None else None
+
+    tasks = []
+    for name, pipeline in models.items():
+        tasks.append((name, None, delayed(_run_task)(fit_full, pipeline, X, y)))
+        for fold, (train_idx, val_idx) in enumerate(folds):
+            tasks.append((name, fold, delayed(_run_task)(
+                fit_fold, pipeline, X, y, train_idx, val_idx, cache, digest)))
+
+    outputs = Parallel(n_jobs=n_jobs)(task for _, _, task in tasks)
+
+    results = {name: {"cv_scores": np.zeros(len(folds)), "oof": None, "error": None}
+               for name in models}
+    for (name, fold, _), (output, error) in zip(tasks, outputs):
+        entry = results[name]
+        if error is not None:
+            entry["error"] = entry["error"] or error
+            continue
+        if fold is None:
+            entry["model"] = output
+            continue
+        accuracy, features = output
+        entry["cv_scores"][fold] = accuracy
+        if entry["oof"] is None:
+            entry["oof"] = np.zeros((len(X), features.shape[1]))
+        entry["oof"][folds[fold][1]] = features
+
+    return {name: ({"error": entry["error"]} if entry["error"] else entry)
+            for name, entry in results.items()}
+
+
+def _temp_path(path):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    os.close(fd)
+    return tmp_path
+
+
+def publish_model(model, metadata, model_path="model/classifier.pkl",
+                  metadata_path="model/model_metadata.json"):
+    """Write the model and its metadata so readers never see partial files.
+
+    Both files are fully written under temporary names first and then
+    renamed into place, so a failed save leaves the previous model intact.
+    The two renames are separate: a reader in between them can pair the
+    new model with the old metadata.
+    """
+    tmp_model = _temp_path(model_path)
+    tmp_metadata = _temp_path(metadata_path)
+    try:
+        joblib.dump(model, tmp_model)
+        with open(tmp_metadata, 'w') as f:
+            json.dump(metadata, f, indent=4)
+        # mkstemp creates 0600; the app and API may run as another user
+        for path in (tmp_model, tmp_metadata):
+            os.chmod(path, 0o644)
+        os.replace(tmp_model, model_path)
+        os.replace(tmp_metadata, metadata_path)
+    finally:
+        for path in (tmp_model, tmp_metadata):
+            if os.path.exists(path):
+                os.remove(path)
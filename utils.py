@@ -1,75 +1,161 @@
+import os
 import re
+import hashlib
+import socket
+import threading
+import time
+import uuid
 from datetime import datetime
-import nltk
-from collections import Counter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 
-# Download required NLTK data (run once)
-try:
-    nltk.data.find('vader_lexicon')
-except LookupError:
-    nltk.download('vader_lexicon', quiet=True)
+import metrics
 
-try:
-    from nltk.sentiment import SentimentIntensityAnalyzer
-    SENTIMENT_AVAILABLE = True
-except:
-    SENTIMENT_AVAILABLE = False
+# NLTK is imported lazily on the first sentiment call: importing it costs
+# seconds, and looking up / downloading the VADER lexicon at import time
+# slowed every cold start and could block without network access.
 
+# Optional path to a local vader_lexicon.txt. When set, the lexicon is read
+# from this file and nltk_data is never searched or downloaded into.
+VADER_LEXICON_PATH = os.environ.get("VADER_LEXICON_PATH")
 
-def get_priority(text):
-    """Determine complaint priority based on keywords and urgency."""
-    if not text or not isinstance(text, str):
-        return "Low"
-    
-    text = text.lower().strip()
-    
+
+# Priority lexicons, highest tier first. Matching is plain substring search
+# (a keyword may match inside a longer word), same as the original scans.
+PRIORITY_KEYWORDS = {
     # Critical keywords (life-threatening, immediate danger)
-    critical_keywords = [
+    "Critical": (
         "emergency", "life threatening", "critical", "danger", "death",
         "fire", "collapse", "explosion", "injury", "bleeding",
         "attack", "severe", "crisis", "urgent attention", "urgent",
         "suffering", "ambulance stuck", "fire hazard", "fire risk",
         "posing serious danger", "critical emergency", "life", "patient"
-    ]
-    
+    ),
     # High priority keywords (health/safety risks, major disruptions)
-    high_keywords = [
+    "High": (
         "hospital", "broken", "damaged", "leak", "flooding",
         "contaminated", "unsafe", "risk", "hazard", "exposed",
         "pollution", "very high", "very low", "industrial", "health", "medical",
         "stagnant water", "sewage", "overflow", "waterlogging", "disrupted",
-        "clogged", "causing accidents", "attacked", "menace", "causing", 
+        "clogged", "causing accidents", "attacked", "menace", "causing",
         "affecting", "insufficient", "lacks", "abandoned", "creating nuisance",
         "stuck", "malfunctioning", "outage", "tilted dangerously", "dilapidated",
         "posing risk", "fire safety", "open manhole", "respiratory problems"
-    ]
-    
+    ),
     # Medium priority keywords (service quality, maintenance)
-    medium_keywords = [
+    "Medium": (
         "problem", "issue", "concern", "need", "needs", "require",
-        "poor", "inadequate", "delayed", "not working", "irregular", 
+        "poor", "inadequate", "delayed", "not working", "irregular",
         "missing", "pending", "slow", "very poor", "not maintained",
         "not available", "not functioning", "not responding", "not clear",
         "difficult", "inconvenience", "overcrowded", "excessive", "unclear",
         "rude", "improper", "limited", "complicated", "frequently", "outdated"
-    ]
-    
-    # Check for critical (highest priority)
-    for keyword in critical_keywords:
-        if keyword in text:
-            return "Critical"
-    
-    # Check for high priority
-    for keyword in high_keywords:
-        if keyword in text:
-            return "High"
-    
-    # Check for medium priority
-    for keyword in medium_keywords:
-        if keyword in text:
-            return "Medium"
-    
-    return "Low"
+    ),
+}
+
+PRIORITY_TIERS = ("Critical", "High", "Medium", "Low")
+
+# Distinct words whose keyword hits are remembered between calls
+PRIORITY_WORD_CACHE_SIZE = 65536
+
+
+def _compile_priority_lexicon():
+    """Flatten the lexicons into index-addressed tables.
+
+    Returns (terms, tiers, probes, phrases): every keyword and its tier in
+    precedence order, the (index, probe) pairs looked up inside each word of
+    a text, and the indices of multi-word keywords. A keyword without spaces
+    always lies inside one whitespace-separated word, so it is its own
+    probe; a phrase is probed by its first word and confirmed against the
+    whole text.
+    """
+    terms, tiers = [], []
+    for tier, keywords in PRIORITY_KEYWORDS.items():
+        for keyword in dict.fromkeys(keywords):
+            terms.append(keyword)
+            tiers.append(tier)
+    probes = tuple((i, term.split()[0]) for i, term in enumerate(terms))
+    phrases = frozenset(i for i, term in enumerate(terms) if " " in term)
+    return tuple(terms), tuple(tiers), probes, phrases
+
+
+_PRIORITY_TERMS, _PRIORITY_TERM_TIERS, _PRIORITY_PROBES, _PRIORITY_PHRASES = _compile_priority_lexicon()
+
+
+# word -> _word_priority_hits(word); emptied when it reaches the size cap
+_priority_word_hits = {}
+
+
+def _word_priority_hits(word):
+    """Indices of the keywords (or phrase openings) found inside one word."""
+    hits = _priority_word_hits.get(word)
+    if hits is None:
+        if len(_priority_word_hits) >= PRIORITY_WORD_CACHE_SIZE:
+            _priority_word_hits.clear()
+        hits = tuple(i for i, probe in _PRIORITY_PROBES if probe in word)
+        _priority_word_hits[word] = hits
+    return hits
+
+
+def _match_priority_lower(lowered, words=None):
+    """match_priority for text that is already lowercased; `words` is
+    lowered.split() if the caller already has it.
+
+    Same result as scanning the text for every keyword, but each word is a
+    dictionary lookup once its hits are cached, so the cost follows the
+    text's length in words rather than keywords x characters.
+    """
+    if words is None:
+        words = lowered.split()
+    try:
+        # Fast path: every word already cached, lookups stay in C
+        hits = set(chain.from_iterable(map(_priority_word_hits.__getitem__, words)))
+    except KeyError:
+        hits = set(chain.from_iterable(map(_word_priority_hits, words)))
+
+    matched = [i for i in sorted(hits)
+               if i not in _PRIORITY_PHRASES or _PRIORITY_TERMS[i] in lowered]
+    if not matched:
+        return "Low", []
+    # Indices follow tier precedence, so the first match decides
+    return _PRIORITY_TERM_TIERS[matched[0]], [_PRIORITY_TERMS[i] for i in matched]
+
+
+def match_priority(text):
+    """Return (priority, matched_terms) for a complaint.
+
+    matched_terms lists every keyword found, highest tier first.
+    """
+    if not text or not isinstance(text, str):
+        return "Low", []
+    return _match_priority_lower(text.lower())
+
+
+def match_priority_batch(texts):
+    """Return (priority, matched_terms) for each complaint in texts.
+
+    A convenience over match_priority: the word cache is shared anyway, so
+    the only batch saving is that duplicate complaints are matched once.
+    """
+    seen = {}
+    results = []
+    for text in texts:
+        key = text if isinstance(text, str) else None
+        if key not in seen:
+            seen[key] = match_priority(text)
+        results.append(seen[key])
+    return results
+
+
+def get_priority(text):
+    """Determine complaint priority based on keywords and urgency."""
+    return match_priority(text)[0]
+
+
+def get_priority_batch(texts):
+    """Determine priorities for a list of complaints."""
+    return [priority for priority, _ in match_priority_batch(texts)]
 
 
 def get_department(category):
@@ -85,26 +171,84 @@ def get_department(category):
     return mapping.get(category, "General Administration")
 
 
-def get_sentiment(text):
-    """Analyze sentiment of the complaint."""
-    if not text or not isinstance(text, str):
-        return {"label": "Neutral", "score": 0.0}
-    
-    if not SENTIMENT_AVAILABLE:
-        return {"label": "Neutral", "score": 0.0}
-    
+_sentiment_analyzer = None
+_sentiment_unavailable = False
+_sentiment_lock = threading.Lock()
+
+# LRU cache of sentiment results keyed on a digest of the complaint text, so
+# duplicate complaints are scored once without keeping full texts in memory.
+SENTIMENT_CACHE_SIZE = 10000
+_sentiment_cache = OrderedDict()
+
+# Batches with fewer uncached texts than this are scored in-process; the
+# process pool only pays off for large backfills.
+SENTIMENT_POOL_THRESHOLD = 2000
+
+NEUTRAL_SENTIMENT = {"label": "Neutral", "score": 0.0}
+
+
+def _build_sentiment_analyzer():
+    """Import NLTK and load the VADER lexicon. Returns None if unavailable."""
+    try:
+        from nltk.sentiment import SentimentIntensityAnalyzer
+
+        if VADER_LEXICON_PATH:
+            lexicon = "file:" + os.path.abspath(VADER_LEXICON_PATH)
+            return SentimentIntensityAnalyzer(lexicon_file=lexicon)
+
+        import nltk
+        try:
+            nltk.data.find('sentiment/vader_lexicon.zip')
+        except LookupError:
+            nltk.download('vader_lexicon', quiet=True)
+        return SentimentIntensityAnalyzer()
+    except Exception:
+        return None
+
+
+def get_sentiment_analyzer():
+    """Return the process-wide VADER analyzer, building it on first use.
+
+    Returns None when NLTK or the lexicon cannot be loaded; that result is
+    remembered so later calls do not retry the download.
+    """
+    global _sentiment_analyzer, _sentiment_unavailable
+    if _sentiment_analyzer is None and not _sentiment_unavailable:
+        with _sentiment_lock:
+            if _sentiment_analyzer is None and not _sentiment_unavailable:
+                _sentiment_analyzer = _build_sentiment_analyzer()
+                _sentiment_unavailable = _sentiment_analyzer is None
+    return _sentiment_analyzer
+
+
+def set_vader_lexicon_path(path):
+    """Use a local VADER lexicon file for sentiment scoring (None to reset)."""
+    global VADER_LEXICON_PATH, _sentiment_analyzer, _sentiment_unavailable
+    with _sentiment_lock:
+        VADER_LEXICON_PATH = path
+        _sentiment_analyzer = None
+        _sentiment_unavailable = False
+        _sentiment_cache.clear()
+
+
+def _text_digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+@metrics.timed("sentiment.score")
+def _score_sentiment(text):
+    """Score one complaint with VADER, bypassing the cache."""
     try:
-        sia = SentimentIntensityAnalyzer()
-        scores = sia.polarity_scores(text)
+        scores = get_sentiment_analyzer().polarity_scores(text)
         compound = scores['compound']
-        
+
         if compound >= 0.05:
             label = "Positive"
         elif compound <= -0.05:
             label = "Negative"
         else:
             label = "Neutral"
-        
+
         return {
             "label": label,
             "score": round(compound, 3),
@@ -113,28 +257,138 @@ def get_sentiment(text):
             "neutral": round(scores['neu'], 3)
         }
     except Exception as e:
-        return {"label": "Neutral", "score": 0.0}
+        metrics.increment("sentiment.failed")
+        return dict(NEUTRAL_SENTIMENT)
+
+
+def _cache_get(digest):
+    with _sentiment_lock:
+        result = _sentiment_cache.get(digest)
+        if result is not None:
+            _sentiment_cache.move_to_end(digest)
+        return result
+
+
+def _cache_put(digest, result):
+    with _sentiment_lock:
+        _sentiment_cache[digest] = result
+        _sentiment_cache.move_to_end(digest)
+        while len(_sentiment_cache) > SENTIMENT_CACHE_SIZE:
+            _sentiment_cache.popitem(last=False)
+
+
+def clear_sentiment_cache():
+    """Drop all cached sentiment results."""
+    with _sentiment_lock:
+        _sentiment_cache.clear()
+
+
+@metrics.timed("sentiment.get")
+def get_sentiment(text):
+    """Analyze sentiment of the complaint."""
+    if not text or not isinstance(text, str):
+        return dict(NEUTRAL_SENTIMENT)
+
+    if get_sentiment_analyzer() is None:
+        return dict(NEUTRAL_SENTIMENT)
+
+    digest = _text_digest(text)
+    result = _cache_get(digest)
+    if result is None:
+        result = _score_sentiment(text)
+        _cache_put(digest, result)
+    return dict(result)
+
+
+@metrics.timed("sentiment.batch")
+def get_sentiment_batch(texts, processes=None, chunksize=256):
+    """Analyze sentiment for many complaints.
+
+    Duplicates and previously scored texts come from the cache. When more
+    than SENTIMENT_POOL_THRESHOLD texts are left to score they are spread over
+    a process pool of `processes` workers (default: CPU count); pass
+    processes=1 to always score in-process.
+    """
+    texts = list(texts)
+    results = [None] * len(texts)
+    pending = {}
+    available = get_sentiment_analyzer() is not None
+
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str) or not available:
+            results[i] = dict(NEUTRAL_SENTIMENT)
+            continue
+        digest = _text_digest(text)
+        cached = _cache_get(digest)
+        if cached is not None:
+            results[i] = dict(cached)
+        else:
+            pending.setdefault(digest, (text, []))[1].append(i)
+
+    if pending:
+        unique_texts = [text for text, _ in pending.values()]
+        if processes != 1 and len(unique_texts) >= SENTIMENT_POOL_THRESHOLD:
+            with ProcessPoolExecutor(max_workers=processes,
+                                     initializer=set_vader_lexicon_path,
+                                     initargs=(VADER_LEXICON_PATH,)) as pool:
+                scored = list(pool.map(_score_sentiment, unique_texts, chunksize=chunksize))
+        else:
+            scored = [_score_sentiment(text) for text in unique_texts]
+
+        for (digest, (_, indexes)), result in zip(pending.items(), scored):
+            _cache_put(digest, result)
+            for i in indexes:
+                results[i] = dict(result)
+
+    return results
+
+
+# Common words dropped from keyword extraction
+KEYWORD_STOP_WORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but',
+    'in', 'with', 'to', 'for', 'of', 'as', 'by', 'this', 'that',
+    'are', 'was', 'were', 'been', 'be', 'have', 'has', 'had', 'do',
+    'does', 'did', 'will', 'would', 'should', 'could', 'may', 'might'
+})
+
+_KEYWORD_PATTERN = re.compile(r'\b[a-z]{4,}\b')
+
+# whitespace-separated word -> its keywords; emptied at PRIORITY_WORD_CACHE_SIZE
+_word_keywords = {}
+
+
+def _keywords_in_word(word):
+    """Keywords inside one whitespace-separated word. A match never spans
+    whitespace, which is also a word boundary, so matching word by word
+    finds exactly what matching the whole text does."""
+    keywords = _word_keywords.get(word)
+    if keywords is None:
+        if len(_word_keywords) >= PRIORITY_WORD_CACHE_SIZE:
+            _word_keywords.clear()
+        keywords = tuple(w for w in _KEYWORD_PATTERN.findall(word) if w not in KEYWORD_STOP_WORDS)
+        _word_keywords[word] = keywords
+    return keywords
+
+
+def _keywords_from_lower(lowered, top_n=5, words=None):
+    """extract_keywords for text that is already lowercased; `words` is
+    lowered.split() if the caller already has it."""
+    if words is None:
+        words = lowered.split()
+    try:
+        found = list(chain.from_iterable(map(_word_keywords.__getitem__, words)))
+    except KeyError:
+        found = list(chain.from_iterable(map(_keywords_in_word, words)))
+    return [word for word, _ in Counter(found).most_common(top_n)]
 
 
 def extract_keywords(text, top_n=5):
     """Extract important keywords from complaint."""
     if not text or not isinstance(text, str):
         return []
-    
+
     try:
-        # Remove common words
-        stop_words = {'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but', 
-                      'in', 'with', 'to', 'for', 'of', 'as', 'by', 'this', 'that',
-                      'are', 'was', 'were', 'been', 'be', 'have', 'has', 'had', 'do',
-                      'does', 'did', 'will', 'would', 'should', 'could', 'may', 'might'}
-        
-        # Tokenize and clean
-        words = re.findall(r'\b[a-z]{4,}\b', text.lower())
-        filtered_words = [w for w in words if w not in stop_words]
-        
-        # Count frequency
-        word_freq = Counter(filtered_words)
-        return [word for word, _ in word_freq.most_common(top_n)]
+        return _keywords_from_lower(text.lower(), top_n)
     except Exception as e:
         return []
 
@@ -173,12 +427,190 @@ def estimate_resolution_time(category, priority):
         return "2-3 days"
 
 
+# Ticket IDs are Snowflake-style: GRV-<local time to the millisecond>-<worker>
+# <sequence>, e.g. GRV-20260104120507123-04210001. Every field is fixed
+# width, so IDs sort by creation time and new rows land at the end of the
+# ticket_id index. The time is local, like the older GRV-<seconds>-<random>
+# IDs, which therefore still sort before every newer ID. (Across a DST
+# fall-back the local clock repeats an hour; IDs stay unique but not
+# ordered within it.) The sequence numbers IDs within a millisecond and the
+# worker number separates processes. Processes that share a database take
+# their worker number from it with claim_ticket_worker(), so no two running
+# processes hold the same one; TICKET_WORKER_ID pins it per deployment
+# instead. Without either it falls back to the process id, which is only
+# safe for a single writer.
+TICKET_WORKER_ID = os.environ.get("TICKET_WORKER_ID")
+TICKET_WORKER_DIGITS = 4
+TICKET_SEQUENCE_DIGITS = 4
+
+# Seconds a leased worker number stays reserved; renewed at half-life
+TICKET_WORKER_LEASE = 3600.0
+
+# _ticket_lock guards the ID state and is only held briefly; _lease_lock
+# serializes lease database calls, which happen outside _ticket_lock
+_ticket_lock = threading.Lock()
+_lease_lock = threading.Lock()
+_ticket_state = {"pid": None, "worker": 0, "last_ms": 0, "sequence": 0,
+                 "db": None, "owner": None, "renew_at": float("inf")}
+
+
+def _reset_ticket_locks():
+    global _ticket_lock, _lease_lock
+    _ticket_lock = threading.Lock()
+    _lease_lock = threading.Lock()
+
+
+# A child forked while another thread held a lock must not inherit it held
+os.register_at_fork(after_in_child=_reset_ticket_locks)
+
+
+def _refresh_ticket_worker(pid, force=False):
+    """Pick (or renew) this process's worker number.
+
+    Call without _ticket_lock held. A renewal that finds another thread
+    already renewing returns at once: the current lease is still valid for
+    half its length, so ID generation carries on meanwhile.
+    """
+    state = _ticket_state
+    first = state["pid"] != pid
+    if not _lease_lock.acquire(blocking=first or force):
+        return
+    try:
+        with _ticket_lock:
+            forked = state["pid"] != pid
+            if not (forked or force or time.monotonic() >= state["renew_at"]):
+                return   # another thread got here first
+            db, owner, worker = state["db"], state["owner"], state["worker"]
+
+        renew_at = float("inf")
+        if TICKET_WORKER_ID:
+            worker = int(TICKET_WORKER_ID) % 10 ** TICKET_WORKER_DIGITS
+        elif db is not None:
+            if forked or owner is None:
+                owner = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex}"
+                worker = None
+            worker = db.lease_ticket_worker(owner, TICKET_WORKER_LEASE, worker,
+                                            max_workers=10 ** TICKET_WORKER_DIGITS)
+            renew_at = time.monotonic() + TICKET_WORKER_LEASE / 2
+        else:
+            worker = pid % 10 ** TICKET_WORKER_DIGITS
+
+        with _ticket_lock:
+            if forked:
+                state.update(last_ms=0, sequence=0)
+            state.update(pid=pid, worker=worker, owner=owner, renew_at=renew_at)
+    finally:
+        _lease_lock.release()
+
+
+def claim_ticket_worker(db):
+    """Lease this process's ticket worker number from `db` and return it.
+
+    Call once at startup in every process that files complaints into a
+    shared database. The lease is renewed as IDs are generated, and a forked
+    child leases its own number.
+    """
+    with _ticket_lock:
+        _ticket_state.update(db=db, owner=None)
+    _refresh_ticket_worker(os.getpid(), force=True)
+    return _ticket_state["worker"]
+
+
 def generate_ticket_id():
-    """Generate unique ticket ID."""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    import random
-    random_suffix = random.randint(1000, 9999)
-    return f"GRV-{timestamp}-{random_suffix}"
+    """Generate a unique, time-ordered ticket ID."""
+    pid = os.getpid()
+    state = _ticket_state
+    if state["pid"] != pid or time.monotonic() >= state["renew_at"]:
+        # First call in this process, a forked child, or a lease to renew
+        _refresh_ticket_worker(pid)
+
+    with _ticket_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > state["last_ms"]:
+            state["last_ms"], state["sequence"] = now_ms, 0
+        else:
+            # Same millisecond, or the clock stepped back: keep counting on
+            # the last one, borrowing the next millisecond when it is full
+            state["sequence"] += 1
+            if state["sequence"] == 10 ** TICKET_SEQUENCE_DIGITS:
+                state["last_ms"], state["sequence"] = state["last_ms"] + 1, 0
+        ms, worker, sequence = state["last_ms"], state["worker"], state["sequence"]
+
+    stamp = datetime.fromtimestamp(ms // 1000).strftime('%Y%m%d%H%M%S')
+    return (f"GRV-{stamp}{ms % 1000:03d}-"
+            f"{worker:0{TICKET_WORKER_DIGITS}d}{sequence:0{TICKET_SEQUENCE_DIGITS}d}")
+
+
+# Fallback when no classifier is loaded or prediction fails
+DEFAULT_CATEGORY = "Administrative"
+
+
+def _predict_categories(classifier, texts):
+    if classifier is not None:
+        try:
+            return list(classifier.predict(texts))
+        except Exception:
+            pass
+    return [DEFAULT_CATEGORY] * len(texts)
+
+
+@metrics.timed("enrich")
+def enrich(texts, classifier=None, batch_size=1000, top_n=5):
+    """Run every complaint analyzer over a list of complaint texts.
+
+    Each text is lowercased and split into words once, and both are shared
+    by the priority matcher and the keyword extractor; category prediction and sentiment run once per batch
+    of `batch_size` texts. `classifier` is anything with a scikit-learn style
+    predict(list_of_texts), e.g. the model loaded from model/classifier.pkl.
+
+    Returns one record per text:
+        {"ticket_id", "category", "priority", "priority_terms", "department",
+         "sentiment", "keywords", "resolution_time"}
+    """
+    texts = ["" if not isinstance(t, str) else t for t in texts]
+    records = []
+
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        categories = _predict_categories(classifier, batch)
+        sentiments = get_sentiment_batch(batch)
+
+        for text, category, sentiment in zip(batch, categories, sentiments):
+            lowered = text.lower()
+            words = lowered.split()
+            priority, terms = _match_priority_lower(lowered, words) if text else ("Low", [])
+            records.append({
+                "ticket_id": generate_ticket_id(),
+                "category": category,
+                "priority": priority,
+                "priority_terms": terms,
+                "department": get_department(category),
+                "sentiment": sentiment,
+                "keywords": _keywords_from_lower(lowered, top_n, words),
+                "resolution_time": estimate_resolution_time(category, priority),
+            })
+
+    return records
+
+
+def complaint_record(analysis, name, email, complaint_text, phone=None, submitted_at=None):
+    """The complaints-table row for a complaint analysed by enrich()."""
+    return {
+        "ticket_id": analysis["ticket_id"],
+        "name": name,
+        "email": email,
+        "phone": phone or "N/A",
+        "complaint_text": complaint_text,
+        "category": analysis["category"],
+        "priority": analysis["priority"],
+        "department": analysis["department"],
+        "sentiment_label": analysis["sentiment"]["label"],
+        "sentiment_score": analysis["sentiment"]["score"],
+        "keywords": ", ".join(analysis["keywords"]),
+        "resolution_time": analysis["resolution_time"],
+        "status": "Pending",
+        "submitted_at": submitted_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
 
 
 def get_contact_info(department):